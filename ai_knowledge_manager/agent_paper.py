@@ -1,43 +1,57 @@
 
 import pydash as _
-import time
+from .parallel import run_parallel
 from .prompts import prompt_assess_paper_type, prompt_paper_meta, prompt_tags_from_paper
 from .paper import Paper, PaperSource
+from .spans import span
+
+
+# retrieval queries for pulling only the relevant chunks of a paper into each prompt
+PAPER_META_QUERY = "abstract novel novelty approach process internal rate of return IRR net present value NPV price sensitivity analysis minimum selling price techno-economic"
+PAPER_TAGS_QUERY = "feedstock biomass target product produced yield conversion fermentation platform chemical building block"
 
 
 # AGENT: PAPER/HTML PARSER
 class PaperAgent(): 
-    def __init__(self, persistence=None):
+    def __init__(self, persistence=None, refresh: bool = True, context_max_tokens: int = 6000):
         self.paper = None
+        self.context_max_tokens = context_max_tokens # token budget for paper text sent with each prompt
         # setup focuses on persistence, paper loading/parsing is separate method
         self.persistence = persistence
-        self.persistence.load_paper_graph() # just ensuring we have most recent data/graph
+        if refresh:
+            self.persistence.load_paper_graph() # just ensuring we have most recent data/graph (batch ingestion shares one loaded store instead)
         
     def assess_paper_type(self):
-        start_time = time.time()
-        dict_results = prompt_assess_paper_type(self.paper.fulltext())
-        end_time = time.time()
-        print(f"[Paper.assess_paper_type]: Took {end_time - start_time} seconds")
+        dict_results = prompt_assess_paper_type(self.paper.fulltext()) # latency/tokens are traced by the LLM client (llm_trace.py)
         if "response" not in dict_results:
             print(f"Strange error, no response in dict_results: {dict_results}")
             dict_results["response"] = next(iter(dict_results.values()))
         return dict_results["response"]
 
     def load_paper(self, link: str):
-        self.paper = self.persistence.retrieve_paper_from_store(link)
-        # if no paper found, let's parse one and save it to using persistence methods
-        if self.paper is None:
-            # init paper & run load func to parse data
-            self.paper = Paper(source=PaperSource(link=link))
-            self.paper.parse()
-            # persist
-            self.persistence.save_paper(self.paper)
+        with span("paper.load", link=link):
+            self.paper = self.persistence.retrieve_paper_from_store(link)
+            # if no paper found, let's parse one and save it to using persistence methods
+            if self.paper is None:
+                # init paper & run load func to parse data
+                self.paper = Paper(source=PaperSource(link=link))
+                with span("paper.parse"):
+                    self.paper.parse()
+                with span("paper.build_chunks"):
+                    self.paper.build_chunks()
+                # persist
+                self.save_paper()
         
     def save_paper(self):
-        self.persistence.save_paper(self.paper)
+        with span("persistence.save_paper"):
+            self.persistence.save_paper(self.paper)
         return self.paper
 
     def process_paper(self, force: bool = False):
+        with span("paper.process", paper_id=self.paper.id):
+            return self._process_paper(force=force)
+
+    def _process_paper(self, force: bool = False):
         print(f"[PaperAgent.process_paper] processing paper (force={force})...")
         # SHORT CIRCUIT: if paper has already been parsed aka there's a 'describes_process' prop
         if self.paper.describes_process != None and force != True:
@@ -48,8 +62,11 @@ class PaperAgent():
 
         # IF describing a novel/single process
         if self.paper.describes_process == "single_process":
-            # summaries about paper, novelty, tecnoeconomics described
-            paper_meta = prompt_paper_meta(self.paper.fulltext())
+            # summaries about paper, novelty, tecnoeconomics described + tags for filtering/search/analysis (independent, so run in parallel)
+            paper_meta, paper_tags = run_parallel([
+                lambda: prompt_paper_meta(self.paper.retrieve(PAPER_META_QUERY, self.context_max_tokens, name="paper.meta")),
+                lambda: prompt_tags_from_paper(self.paper.retrieve(PAPER_TAGS_QUERY, self.context_max_tokens, name="paper.tags")),
+            ])
             # update paper props
             self.paper.text_abstract = paper_meta.get("abstract")
             self.paper.text_novelty = paper_meta.get("novelty")
@@ -57,8 +74,6 @@ class PaperAgent():
                 self.paper.text_irr = paper_meta.get("irr")
             if paper_meta.get("has_price_sensitivity") == True:
                 self.paper.text_price_sensitivity = paper_meta.get("price_sensitivity")
-            # tags for filtering/search/analysis
-            paper_tags = prompt_tags_from_paper(self.paper.fulltext())
             self.paper.tags_doe = paper_tags.get("tags_doe")
             self.paper.tags_feedstocks = paper_tags.get("tags_feedstocks")
             self.paper.tags_target_product = paper_tags.get("tags_target_product")
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable
+from .record_log import RecordLog
+
+
+# ##########################################
+# RAW ARTIFACT STORE
+# Fetched/extracted artifacts (scraped HTML, PDF bytes, extracted text) are stored as content-addressed blobs
+# ("blobs/ab/abcdef...") with an index (RecordLog) mapping sources to blob hashes plus what we need to revalidate:
+# ETag/Last-Modified for URLs, mtime/size for local files. Extracted text is keyed on the source's content hash and
+# the extractor's name, so re-parsing never refetches and only a changed extractor re-extracts.
+
+class ArtifactStore():
+    def __init__(self, dir_path: str, max_age_seconds: float = 60 * 60 * 24):
+        self.dir_path = dir_path
+        self.max_age_seconds = max_age_seconds # URLs checked within this window are used w/o any network request
+        os.makedirs(os.path.join(dir_path, "blobs"), exist_ok=True)
+        self._index = RecordLog(os.path.join(dir_path, "index.json"))
+        self._index.load()
+
+    # --- blobs
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.dir_path, "blobs", content_hash[0:2], content_hash)
+
+    def put_blob(self, content: bytes) -> str:
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(content_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(content)
+            os.replace(tmp_path, path)
+        return content_hash
+
+    def get_blob(self, content_hash: str) -> bytes:
+        path = self._blob_path(content_hash)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as file:
+            return file.read()
+
+    # --- records (small JSON values kept in the index, ex: figure descriptions)
+
+    def get_record(self, key: str):
+        return self._index.data.get(key)
+
+    def put_record(self, key: str, value):
+        self._index.put(key, value)
+
+    def iter_records(self, prefix: str):
+        """(key, value) for every record whose key starts with prefix"""
+        for key, value in list(self._index.data.items()):
+            if key.startswith(prefix):
+                yield key, value
+
+    # --- urls
+
+    def _revalidate_url(self, url: str, entry: dict) -> bool:
+        """Conditional GET against the URL, True if the cached HTML is still current"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+                body_hash = hashlib.sha256(response.read()).hexdigest()
+                # no validators from the server, fall back to comparing the raw (pre-JS) response body
+                return not entry.get("etag") and not entry.get("last_modified") and body_hash == entry.get("http_hash")
+        except urllib.error.HTTPError as err:
+            return err.code == 304
+        except Exception as err:
+            print(f"[ArtifactStore._revalidate_url] could not revalidate {url}: {err}")
+            return False
+
+    def _url_validators(self, url: str) -> dict:
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                return dict(
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    http_hash=hashlib.sha256(response.read()).hexdigest())
+        except Exception:
+            return {}
+
+    def fetch_html(self, url: str, scrape_fn: Callable[[str], str]) -> str:
+        """Scraped HTML for a URL, reusing the stored copy while it's fresh or the server says it's unchanged"""
+        key = f"html:{url}"
+        entry = self._index.data.get(key)
+        if entry != None:
+            html = self.get_blob(entry["content_hash"])
+            if html != None:
+                if time.time() - entry["checked_at"] < self.max_age_seconds or self._revalidate_url(url, entry):
+                    print(f"[ArtifactStore.fetch_html] cached: {url}")
+                    if time.time() - entry["checked_at"] >= self.max_age_seconds:
+                        self._index.put(key, { **entry, "checked_at": time.time() })
+                    return html.decode("utf-8")
+        print(f"[ArtifactStore.fetch_html] fetching: {url}")
+        html = scrape_fn(url)
+        self._index.put(key, dict(
+            content_hash=self.put_blob(html.encode("utf-8")),
+            checked_at=time.time(),
+            **self._url_validators(url)))
+        return html
+
+    def fetch_bytes(self, url: str) -> dict:
+        """Download a static asset (ex: figure image) once, returning dict(content_hash, content_type). Never revalidated"""
+        key = f"bytes:{url}"
+        entry = self._index.data.get(key)
+        if entry != None and os.path.exists(self._blob_path(entry["content_hash"])):
+            return entry
+        print(f"[ArtifactStore.fetch_bytes] fetching: {url}")
+        request = urllib.request.Request(url, headers={ "User-Agent": "Mozilla/5.0" })
+        with urllib.request.urlopen(request, timeout=30) as response:
+            entry = dict(content_hash=self.put_blob(response.read()), content_type=response.headers.get_content_type())
+        self._index.put(key, entry)
+        return entry
+
+    def iter_html(self):
+        """(url, html) for every stored page"""
+        for key, entry in list(self._index.data.items()):
+            if key.startswith("html:"):
+                html = self.get_blob(entry["content_hash"])
+                if html != None:
+                    yield key[len("html:"):], html.decode("utf-8")
+
+    # --- local files
+
+    def file_content_hash(self, path: str) -> str:
+        """Content hash of a local file (stored as a blob), only re-read when its mtime/size change"""
+        key = f"file:{os.path.abspath(path)}"
+        stat = os.stat(path)
+        entry = self._index.data.get(key)
+        if entry != None and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size and os.path.exists(self._blob_path(entry["content_hash"])):
+            return entry["content_hash"]
+        with open(path, 'rb') as file:
+            content_hash = self.put_blob(file.read())
+        self._index.put(key, dict(content_hash=content_hash, mtime=stat.st_mtime, size=stat.st_size))
+        return content_hash
+
+    def _extract(self, path: str, extract_fn: Callable[[str], bytes], extractor: str) -> bytes:
+        key = f"text:{self.file_content_hash(path)}:{extractor}"
+        entry = self._index.data.get(key)
+        if entry != None:
+            content = self.get_blob(entry["content_hash"])
+            if content != None:
+                print(f"[ArtifactStore.extract] cached: {path} ({extractor})")
+                return content
+        content = extract_fn(path)
+        self._index.put(key, dict(content_hash=self.put_blob(content)))
+        return content
+
+    def extract_text(self, path: str, extract_fn: Callable[[str], str], extractor: str) -> str:
+        """Text extracted from a local file (ex: PDF), reused until the file or the extractor name changes"""
+        return self._extract(path, lambda p: extract_fn(p).encode("utf-8"), extractor).decode("utf-8")
+
+    def extract_json(self, path: str, extract_fn: Callable[[str], dict], extractor: str) -> dict:
+        """Same as extract_text, for extractors returning JSON-able data (ex: text + page offsets)"""
+        return json.loads(self._extract(path, lambda p: json.dumps(extract_fn(p)).encode("utf-8"), extractor))
+
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+def get_artifact_store() -> ArtifactStore:
+    """Process-wide store at ARTIFACT_CACHE_DIR (default ./data/caches/artifacts)"""
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore(os.environ.get("ARTIFACT_CACHE_DIR", "./data/caches/artifacts"))
+    return _artifact_store
@@ -0,0 +1,140 @@
+import argparse
+import os
+import time
+from typing import Callable, List, Tuple
+from bs4 import BeautifulSoup
+import yaml
+from .artifacts import get_artifact_store
+from .html_parsing import HTML_PARSER, NatureParser, NIHParser
+
+
+# ##########################################
+# BENCHMARK: HTML PARSING
+# Compares the previous Paper.parse_html_nature/nih implementations (html.parser, unused select passes, yaml.dump per
+# paragraph) against the html_parsing parsers on saved HTML. Figure prompts are left out of both, so this only measures parsing.
+# python -m ai_knowledge_manager.bench_html_parsing [page.html ...] [--repeat 5]
+# Without files, HTML stored by the artifact store is used, falling back to generated fixtures.
+
+# --- previous implementations (kept only as the benchmark baseline)
+
+def _legacy_yaml_text(text: str) -> str:
+    return yaml.dump(text).replace("\\\n  \\ ", "").replace("\n  ", "").strip()
+
+def legacy_parse_nature_html(html: str) -> dict:
+    soup = BeautifulSoup(html, "html.parser")
+    soup_article = soup.article
+    soup_article_header = soup.select("article div.c-article-header")
+    soup_article_body = soup.select("article div.c-article-body")
+    soup_article_body_sections = soup.select("article section")
+    soup_bibliography_items = soup.select("li.c-bibliographic-information__list-item")
+    title = soup.h1.text if soup.h1 else None
+    doi = None
+    for item in soup_bibliography_items:
+        if 'DOI' in item.get_text():
+            doi_value_span = item.find('span', class_='c-bibliographic-information__value')
+            if doi_value_span:
+                doi = doi_value_span.get_text().strip()
+                break
+    sections = []
+    for section in soup_article_body_sections:
+        section_h2 = section.find("h2")
+        if section_h2 == None: continue
+        section_content = section.select(".c-article-section__content")
+        content = _legacy_yaml_text(section_content[0].text) if section_content else ""
+        for figure in section.select("figure"):
+            figure.select_one("figcaption")
+            figure.select(".c-article-section__figure-description")
+            figure.select("img")
+        sections.append(dict(html=str(section), title=section_h2.text, content=content))
+    return dict(title=title, doi=doi, sections=sections)
+
+def legacy_parse_nih_html(html: str) -> dict:
+    soup = BeautifulSoup(html, "html.parser")
+    soup_article = soup.select_one("#mc")
+    soup_article_header = soup.select_one("h1")
+    soup_article_body = soup.select_one(".jig-ncbiinpagenav")
+    soup_bibliography_items = soup.select(".ref-cit-blk")
+    soup_article_body_sections = soup.select("div.tsec.sec")
+    title = soup.h1.text if soup.h1 else None
+    soup_doi = soup.select_one("span.doi a")
+    doi = ("https:" + soup_doi.attrs["href"]) if soup_doi else None
+    sections = []
+    for section in soup_article_body_sections:
+        section_h2 = section.find("h2")
+        if section_h2 == None: continue
+        content = ""
+        for child in section.findChildren():
+            if child.name == "h2" or "goto" in child.get("class", []):
+                continue
+            if (child.name == "p" and "p" in child.get("class", [])) or (child.name == "div" and "table-wrap" in child.get("class", [])):
+                content += _legacy_yaml_text(child.text) + "\n\n"
+            if child.name == "div" and "fig" in child.get("class", []):
+                child.select_one(".caption")
+                child.select_one("img")
+        sections.append(dict(html=str(section), title=section_h2.text, content=content))
+    return dict(title=title, doi=doi, sections=sections)
+
+
+# --- fixtures
+
+def generate_fixture(kind: str, num_sections: int = 12, paragraphs_per_section: int = 8) -> str:
+    """Synthetic article shaped like the journal's markup, for when no saved HTML is around"""
+    paragraph = "Lignocellulosic   biomass was pretreated\n   with dilute acid at 160 C, and the hydrolysate fermented to ethanol at a yield of 0.45 g/g. " * 6
+    sections = []
+    for s in range(num_sections):
+        paragraphs = "".join(f"<p class='p'>{paragraph}</p>" for _ in range(paragraphs_per_section))
+        if kind == "nature":
+            figure = f"<figure><figcaption>Fig. {s}</figcaption><div class='c-article-section__figure-description'><p>Process flow {s}</p></div><img src='//media.example.com/fig{s}.png'/></figure>"
+            sections.append(f"<section><div><h2>Section {s}</h2><div class='c-article-section__content'>{paragraphs}{figure}{paragraphs}</div></div></section>")
+        else:
+            figure = f"<div class='fig'><div class='caption'><p>Figure {s}</p></div><img src='/pmc/fig{s}.png'/></div>"
+            sections.append(f"<div class='tsec sec'><h2>Section {s}</h2>{paragraphs}{figure}<div class='table-wrap'><table><tr><td>yield</td><td>0.45</td></tr></table></div>{paragraphs}</div>")
+    nav = "<nav>" + "".join(f"<a href='/x/{i}'>link {i}</a>" for i in range(200)) + "</nav>"
+    if kind == "nature":
+        bibliography = "<ul><li class='c-bibliographic-information__list-item'>DOI <span class='c-bibliographic-information__value'>https://doi.org/10.1038/srep00000</span></li></ul>"
+        return f"<html><body>{nav}<article><div class='c-article-header'><h1>Synthetic paper</h1></div><div class='c-article-body'>{''.join(sections)}</div>{bibliography}</article></body></html>"
+    return f"<html><body>{nav}<div id='mc'><h1>Synthetic paper</h1><span class='doi'><a href='//doi.org/10.0000/pmc0000'>doi</a></span>{''.join(sections)}</div></body></html>"
+
+def load_fixtures(paths: List[str]) -> List[Tuple[str, str, str]]:
+    """(name, kind, html) for HTML files, stored HTML, or generated fixtures"""
+    fixtures = []
+    for path in paths:
+        with open(path, 'r') as file:
+            html = file.read()
+        fixtures.append((os.path.basename(path), "nih" if ("tsec sec" in html or "ncbi" in html) else "nature", html))
+    if not fixtures:
+        for url, html in get_artifact_store().iter_html():
+            if "nature.com" in url or "nih.gov" in url:
+                fixtures.append((url, "nature" if "nature.com" in url else "nih", html))
+    if not fixtures:
+        fixtures = [("generated_nature", "nature", generate_fixture("nature")), ("generated_nih", "nih", generate_fixture("nih"))]
+    return fixtures
+
+
+# --- run
+
+def time_parse(fn: Callable[[str], dict], html: str, repeat: int) -> float:
+    """Best of `repeat` runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn(html)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best == None else min(best, elapsed)
+    return best
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark journal HTML parsing, previous vs current")
+    parser.add_argument("paths", nargs="*", help="saved HTML files (defaults to stored or generated HTML)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    parsers = dict(nature=(legacy_parse_nature_html, lambda html: NatureParser(html).parse()), nih=(legacy_parse_nih_html, lambda html: NIHParser(html).parse()))
+    print(f"[bench_html_parsing] current parser backend: {HTML_PARSER}")
+    for name, kind, html in load_fixtures(args.paths):
+        legacy_fn, current_fn = parsers[kind]
+        legacy_s = time_parse(legacy_fn, html, args.repeat)
+        current_s = time_parse(current_fn, html, args.repeat)
+        print(f"[bench_html_parsing] {name} ({kind}, {len(html) // 1024} KB): previous {legacy_s * 1000:.1f} ms | current {current_s * 1000:.1f} ms | {legacy_s / current_s:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,33 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import os
 import pydash as _
+from .llm_cache import wrap_llm_client
 
 # ENV
 load_dotenv()
 
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai").lower()
+
 # TODO: GOOGLE (Connecting to Drive for paper persistence)
 
 # OPENAI
 openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+deepseek_client = OpenAI(
+    api_key=os.environ.get("DEEPSEEK_API_KEY"),
+    base_url="https://api.deepseek.com"
+)
+
+def get_llm_client():
+    # rate limited per provider, and responses are cached on disk keyed on the request so identical prompts don't hit the network twice
+    if LLM_PROVIDER == "deepseek":
+        return wrap_llm_client(deepseek_client, "deepseek")
+    return wrap_llm_client(openai_client, "openai")
+
+def get_embedding_client():
+    # embeddings always go to OpenAI (DeepSeek has no embeddings endpoint), whatever LLM_PROVIDER is
+    return openai_client
+
+def get_llm_model(model=None):
+    if LLM_PROVIDER == "deepseek":
+        return model or "deepseek-chat"
+    return model or "gpt-4-turbo-preview"
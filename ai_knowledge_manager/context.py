@@ -0,0 +1,116 @@
+import contextlib
+import contextvars
+import json
+import threading
+from typing import List, Tuple
+from .retrieval import retrieve_text
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+
+# ##########################################
+# PROMPT CONTEXT
+# Builds compact, token-budgeted context for prompts (only the relevant chunks of a text, JSON without
+# nested paper bodies) and records how much of each prompt's budget was used: process-wide in context_budget_report,
+# and per run in a ContextBudgetReport made active for it (held in a ContextVar, like spans.py's parent span, so
+# concurrent runs and their run_parallel/asyncio.to_thread workers each record into their own).
+
+def count_tokens(text: str) -> int:
+    """Token count via tiktoken when installed, otherwise a ~4 chars/token estimate"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[0:max_tokens * 4]
+
+
+# --- budget reporting
+
+class ContextBudgetReport():
+    def __init__(self):
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, tokens_in: int, tokens_out: int, budget: int):
+        """Record a context build: tokens available, tokens sent, budget"""
+        with self._lock:
+            entry = self.entries.setdefault(name, dict(calls=0, tokens_in=0, tokens_out=0, budget=budget, truncated=0))
+            entry["calls"] += 1
+            entry["tokens_in"] += tokens_in
+            entry["tokens_out"] += tokens_out
+            entry["truncated"] += 1 if tokens_in > tokens_out else 0
+
+    def summary(self) -> dict:
+        with self._lock:
+            return { name: dict(entry) for name, entry in self.entries.items() }
+
+    def print(self):
+        print("[ContextBudgetReport]")
+        for name, entry in self.summary().items():
+            saved = 1 - (entry["tokens_out"] / entry["tokens_in"]) if entry["tokens_in"] else 0
+            print(f"  {name}: {entry['calls']} calls, {entry['tokens_out']}/{entry['tokens_in']} tokens sent ({saved:.0%} saved), budget {entry['budget']}, truncated {entry['truncated']}x")
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+
+    @contextlib.contextmanager
+    def active(self):
+        """Also record context builds made inside this block into this report
+            Ex) with report.active(): ...
+        """
+        token = _current_report.set(self)
+        try:
+            yield self
+        finally:
+            _current_report.reset(token)
+
+context_budget_report = ContextBudgetReport() # process-wide totals
+_current_report = contextvars.ContextVar("context_budget_report", default=None)
+
+def _record_budget(name: str, tokens_in: int, tokens_out: int, budget: int):
+    context_budget_report.record(name, tokens_in, tokens_out, budget)
+    report = _current_report.get()
+    if report != None:
+        report.record(name, tokens_in, tokens_out, budget)
+
+
+# --- context builders
+
+def build_text_context(text: str, query: str, max_tokens: int, name: str = "text", spans: List[Tuple[int, int]] = None) -> str:
+    """Keep the chunks most relevant to the query (BM25 over sentence windows) within a token budget, in original order"""
+    tokens_in = count_tokens(text)
+    if tokens_in <= max_tokens:
+        _record_budget(name, tokens_in, tokens_in, max_tokens)
+        return text
+    context = retrieve_text(text, query, max_tokens, count_tokens, spans=spans)
+    # a single huge chunk that can't fit falls back to truncation
+    context = context or truncate_to_tokens(text, max_tokens)
+    _record_budget(name, tokens_in, count_tokens(context), max_tokens)
+    return context
+
+def build_json_context(data, max_tokens: int, name: str = "json", omit_keys: List[str] = ("paper", "sections", "html")) -> str:
+    """Compact JSON (no indentation, nested paper bodies dropped) truncated to a token budget"""
+    def strip(value):
+        if isinstance(value, dict):
+            return { k: strip(v) for k, v in value.items() if k not in omit_keys and v not in (None, [], {}) }
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+    context = json.dumps(strip(data), separators=(",", ":"), default=str)
+    tokens_in = count_tokens(context)
+    if tokens_in > max_tokens:
+        context = truncate_to_tokens(context, max_tokens)
+    _record_budget(name, tokens_in, min(tokens_in, max_tokens), max_tokens)
+    return context
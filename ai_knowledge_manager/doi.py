@@ -0,0 +1,24 @@
+import re
+import urllib.parse
+from typing import Optional
+
+
+# ##########################################
+# DOIs
+# One normalizer for every DOI source (persistence lookups, journal HTML, PDF metadata/text), so paper IDs built by
+# the parsers always match the persistence DOI index. DOIs are case-insensitive, so the bare form is lowercased.
+
+DOI_PREFIX_RE = re.compile(r"^(https?:)?(//)?(dx\.)?(doi\.org/)?(doi:\s*)?")
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """Normalize a DOI to its bare lowercase form (ex: 'https://doi.org/10.1038/SREP20361' -> '10.1038/srep20361')"""
+    if not doi:
+        return None
+    doi = DOI_PREFIX_RE.sub("", urllib.parse.unquote(str(doi)).strip().lower())
+    return doi or None
+
+def doi_url(doi: Optional[str]) -> Optional[str]:
+    """Bare or prefixed DOI -> 'https://doi.org/...' form used as paper IDs"""
+    doi = normalize_doi(doi)
+    return f"https://doi.org/{doi}" if doi else None
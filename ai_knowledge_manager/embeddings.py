@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from typing import List, Tuple
+import numpy as np
+from .clients import get_embedding_client
+from .llm_trace import llm_tracer
+from .paper import Paper
+from .rate_limit import get_llm_rate_limiter
+from .record_log import RecordLog
+from .spans import span
+
+
+# ##########################################
+# EMBEDDERS
+# Pluggable: OpenAI embeddings API, or a local CPU model via sentence-transformers (optional dependency)
+
+class OpenAIEmbedder():
+    def __init__(self, model: str = "text-embedding-3-small", batch_size: int = 256, client=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.client = client or get_embedding_client()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        # same OpenAI rate limiter and tracing as chat completions (llm_cache.py)
+        get_llm_rate_limiter("openai").acquire()
+        start_time = time.perf_counter()
+        with span("llm", prompt="embed", model=self.model):
+            try:
+                response = self.client.embeddings.create(model=self.model, input=texts)
+            except Exception as err:
+                llm_tracer.record("embed", "openai", self.model, latency_s=time.perf_counter() - start_time, error=f"{type(err).__name__}: {err}")
+                raise
+        llm_tracer.record("embed", "openai", self.model, response, latency_s=time.perf_counter() - start_time)
+        return [item.embedding for item in response.data]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        print(f"[OpenAIEmbedder.embed] {len(texts)} texts")
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[i:i + self.batch_size]))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class LocalEmbedder():
+    def __init__(self, model: str = "all-MiniLM-L6-v2", batch_size: int = 64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("LocalEmbedder requires sentence-transformers (pip install sentence-transformers)")
+        self.model = model
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model, device="cpu")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        print(f"[LocalEmbedder.embed] {len(texts)} texts")
+        return np.asarray(self._model.encode(texts, batch_size=self.batch_size), dtype=np.float32)
+
+
+def get_embedder(kind: str = None):
+    """Embedder by kind ('openai' or 'local'), defaulting to EMBEDDING_PROVIDER env"""
+    kind = (kind or os.environ.get("EMBEDDING_PROVIDER", "openai")).lower()
+    if kind == "local":
+        return LocalEmbedder()
+    return OpenAIEmbedder()
+
+
+# ##########################################
+# EMBEDDING STORE
+# Unit-normalized float32 rows appended to a raw matrix file ("vectors.<generation>.f32"), read back memory-mapped, so
+# cosine similarity across the whole library is a single matrix-vector product. The index is a RecordLog ("index.json"
+# + its JSONL sidecar) with one record per paper mapping it to its contiguous block of rows and their text names, so
+# adding a paper appends one line instead of rewriting the index. Re-embedding a paper appends a new block and leaves
+# the old rows unreferenced, and once those outnumber live rows by compact_ratio the live rows are copied into the
+# next generation's matrix file, which the compacted index then points to (the old file is only removed after).
+
+INDEX_META_KEY = "__meta__" # dim, model, vectors_file
+
+class EmbeddingStore():
+    def __init__(self, dir_path: str, compact_ratio: float = 1.0, compact_min_rows: int = 10000):
+        self.dir_path = dir_path
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+        self._lock = threading.Lock()
+        os.makedirs(dir_path, exist_ok=True)
+        self._index = RecordLog(os.path.join(dir_path, "index.json"))
+        self._index.load()
+        self._load_rows()
+
+    def _load_rows(self):
+        """Rebuild row lookups from the index: paper -> row indices, row -> (paper_id, name), and the dead row mask"""
+        self.meta = self._index.data.get(INDEX_META_KEY) or dict(dim=None, model=None, vectors_file="vectors.0.f32")
+        self._vectors_path = os.path.join(self.dir_path, self.meta["vectors_file"])
+        papers = { key: entry for key, entry in self._index.data.items() if key != INDEX_META_KEY }
+        # blocks are only ever appended, so the most recently added paper's block ends at the last row
+        self.num_rows = max([entry["start"] + len(entry["names"]) for entry in papers.values()], default=0)
+        self._paper_rows = {}
+        self._row_names = [None] * self.num_rows
+        self._deleted = np.ones(self.num_rows, dtype=bool)
+        for paper_id, entry in papers.items():
+            rows = list(range(entry["start"], entry["start"] + len(entry["names"])))
+            self._paper_rows[paper_id] = rows
+            self._deleted[rows] = False
+            for row_idx, name in zip(rows, entry["names"]):
+                self._row_names[row_idx] = (paper_id, name)
+
+    def has_paper(self, paper_id: str) -> bool:
+        return paper_id in self._paper_rows
+
+    def matrix(self) -> np.ndarray:
+        """Memory-mapped (rows x dim) matrix of all stored vectors"""
+        if self.num_rows == 0:
+            return np.zeros((0, self.meta["dim"] or 0), dtype=np.float32)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(self.num_rows, self.meta["dim"]))
+
+    def add(self, paper_id: str, names: List[str], vectors: np.ndarray, model: str = None):
+        """Append vectors for a paper, replacing any it had before"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            if self.meta["dim"] == None:
+                self.meta = dict(self.meta, dim=int(vectors.shape[1]), model=model)
+                self._index.put(INDEX_META_KEY, self.meta)
+            if vectors.shape[1] != self.meta["dim"] or (model and self.meta["model"] and model != self.meta["model"]):
+                raise ValueError(f"Embeddings ({model}, dim {vectors.shape[1]}) don't match store ({self.meta['model']}, dim {self.meta['dim']})")
+            # the index is written after vectors, so a crash can leave bytes past the last indexed row. Drop them before
+            # appending, otherwise the new rows would land after them and be read back shifted
+            num_bytes = self.num_rows * self.meta["dim"] * 4
+            if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > num_bytes:
+                os.truncate(self._vectors_path, num_bytes)
+            with open(self._vectors_path, 'ab') as file:
+                file.write(vectors.tobytes())
+            for row_idx in self._paper_rows.pop(paper_id, []): # replaced rows stay in the matrix, unreferenced
+                self._deleted[row_idx] = True
+                self._row_names[row_idx] = None
+            start = self.num_rows
+            self._index.put(paper_id, dict(start=start, names=list(names)))
+            self.num_rows += len(names)
+            self._paper_rows[paper_id] = list(range(start, self.num_rows))
+            self._row_names.extend([(paper_id, name) for name in names])
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(names), dtype=bool)])
+            num_deleted = int(self._deleted.sum())
+            if num_deleted > max((self.num_rows - num_deleted) * self.compact_ratio, self.compact_min_rows):
+                self._compact()
+
+    def _compact(self):
+        """Copy live rows into the next generation's matrix file and point a compacted index at it"""
+        print(f"[EmbeddingStore._compact] dropping {int(self._deleted.sum())} of {self.num_rows} rows")
+        mat = self.matrix()
+        generation = int(self.meta["vectors_file"].split(".")[1]) + 1
+        vectors_file = f"vectors.{generation}.f32"
+        data = { INDEX_META_KEY: dict(self.meta, vectors_file=vectors_file) }
+        start = 0
+        with open(os.path.join(self.dir_path, vectors_file), 'wb') as file:
+            for paper_id, rows in self._paper_rows.items():
+                data[paper_id] = dict(start=start, names=[self._row_names[row_idx][1] for row_idx in rows])
+                if rows:
+                    file.write(np.asarray(mat[rows[0]:rows[-1] + 1]).tobytes())
+                start += len(rows)
+        del mat
+        old_vectors_path = self._vectors_path
+        self._index.data = data
+        self._index.compact()
+        self._load_rows()
+        os.remove(old_vectors_path)
+
+    def search(self, query_vector: np.ndarray, k: int = 10, exclude_paper_id: str = None) -> List[Tuple[str, str, float]]:
+        """Top-k (paper_id, text name, cosine similarity) across every stored text"""
+        mat = self.matrix()
+        if mat.shape[0] == 0:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        scores = mat @ (query_vector / (np.linalg.norm(query_vector) or 1))
+        # mask replaced/excluded rows
+        mask = self._deleted.copy()
+        mask[self._paper_rows.get(exclude_paper_id, [])] = True
+        scores = np.where(mask, -np.inf, scores)
+        k = min(k, int((~mask).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[0:k]
+        top = top[np.argsort(-scores[top])]
+        return [(*self._row_names[i], float(scores[i])) for i in top]
+
+    def search_papers(self, query_vector: np.ndarray, k: int = 10, exclude_paper_id: str = None) -> List[Tuple[str, float]]:
+        """Top-k (paper_id, best cosine similarity) with one result per paper"""
+        best = {}
+        for paper_id, _, score in self.search(query_vector, k=k * 20, exclude_paper_id=exclude_paper_id):
+            best[paper_id] = max(score, best.get(paper_id, -1))
+        return sorted(best.items(), key=lambda s: -s[1])[0:k]
+
+    def paper_vector(self, paper_id: str) -> np.ndarray:
+        """Mean of a paper's stored vectors"""
+        rows = self._paper_rows.get(paper_id)
+        if not rows:
+            return None
+        return np.asarray(self.matrix()[rows]).mean(axis=0)
+
+    def related_papers(self, paper_id: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Papers most similar to a stored paper"""
+        vector = self.paper_vector(paper_id)
+        if vector is None:
+            return []
+        return self.search_papers(vector, k=k, exclude_paper_id=paper_id)
+
+
+# ##########################################
+# EMBEDDING STAGE
+
+def embed_paper(paper: Paper, embedder, store: EmbeddingStore, force: bool = False) -> List[Paper.Text]:
+    """Embed a paper's chunks, store the vectors, and return them as Paper.Text (w/ embeddings filled in)"""
+    print(f"[embed_paper] {paper.id}")
+    if store.has_paper(paper.id) and force != True:
+        print(f"[embed_paper] already embedded, skipping")
+        return []
+    if not paper.chunks:
+        paper.build_chunks()
+    text = paper.fulltext()
+    texts = [Paper.Text(name=f"chunk_{i}", text=text[chunk.start:chunk.end]) for i, chunk in enumerate(paper.chunks)]
+    texts = [t for t in texts if t.text.strip()]
+    if not texts:
+        return []
+    vectors = embedder.embed([t.text for t in texts])
+    for t, vector in zip(texts, vectors):
+        t.embeddings = vector.tolist()
+    store.add(paper.id, [t.name for t in texts], vectors, model=embedder.model)
+    return texts
+
+def search_library(query: str, embedder, store: EmbeddingStore, k: int = 10) -> List[Tuple[str, float]]:
+    """Top-k papers for a free text query"""
+    return store.search_papers(embedder.embed([query])[0], k=k)
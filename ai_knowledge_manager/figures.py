@@ -0,0 +1,155 @@
+import base64
+import io
+import threading
+from typing import List, Optional, Tuple
+from .artifacts import get_artifact_store
+from .parallel import run_parallel
+from .prompts import prompt_figure_description
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# ##########################################
+# FIGURE INTERPRETATION
+# Figure images are downloaded once into the artifact store and described by the vision model once per image:
+# descriptions are stored keyed on the image's content hash, plus a perceptual hash (dHash, when Pillow is installed)
+# so re-encoded/resized copies of a figure across papers and versions (within a few bits of Hamming distance) are
+# deduped too. Uncached figures are described
+# concurrently, and a reparse costs no vision calls.
+
+def perceptual_hash(content: bytes, hash_size: int = 16) -> Optional[str]:
+    """Difference hash (grayscale, compare horizontal neighbors), None without Pillow, for unreadable images, or for
+        flat images (no gradients, so every bit is the same and unrelated images would collide)"""
+    if Image is None:
+        return None
+    try:
+        pixels = list(Image.open(io.BytesIO(content)).convert("L").resize((hash_size + 1, hash_size)).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[row * (hash_size + 1) + col] > pixels[row * (hash_size + 1) + col + 1])
+    if bits == 0 or bits == (1 << hash_size * hash_size) - 1:
+        return None
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+class FigureDescriber():
+    def __init__(self, store=None, concurrency: int = 8, max_phash_distance: int = 8):
+        self.store = store or get_artifact_store()
+        self.concurrency = concurrency
+        self.max_phash_distance = max_phash_distance # of 256 bits
+        self.stats = dict(figures=0, cached=0, deduped=0, described=0, failed=0)
+        self._lock = threading.Lock()
+        self._phashes = None # described perceptual hashes (int) -> record key, loaded on first use
+
+    def _similar_phash_key(self, phash: str) -> Optional[str]:
+        """Record key of an already described image within max_phash_distance of phash"""
+        with self._lock:
+            if self._phashes is None:
+                self._phashes = { int(key[len("figure_phash:"):], 16): key for key, _ in self.store.iter_records("figure_phash:") }
+            value = int(phash, 16)
+            for other, key in self._phashes.items():
+                if bin(value ^ other).count("1") <= self.max_phash_distance:
+                    return key
+        return None
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _download(self, image_url: str) -> Optional[dict]:
+        try:
+            return self.store.fetch_bytes(image_url)
+        except Exception as err:
+            print(f"[FigureDescriber._download] failed: {image_url}, {err}")
+            return None
+
+    def _cached_description(self, keys: List[str]) -> Optional[str]:
+        for key in keys:
+            entry = self.store.get_record(key)
+            if entry != None:
+                return entry["description"]
+        # near-duplicate of a described image
+        if keys[-1].startswith("figure_phash:"):
+            similar_key = self._similar_phash_key(keys[-1][len("figure_phash:"):])
+            if similar_key != None:
+                return self.store.get_record(similar_key)["description"]
+        return None
+
+    def _describe(self, caption: str, image_url: str, image: Optional[dict], keys: List[str]) -> Optional[str]:
+        # images we have are sent inline, so the model doesn't need to fetch from the publisher
+        if image != None:
+            encoded = base64.b64encode(self.store.get_blob(image["content_hash"])).decode("ascii")
+            image_url = f"data:{image['content_type'] or 'image/png'};base64,{encoded}"
+        try:
+            description = prompt_figure_description(caption, image_url)
+        except Exception as err:
+            print(f"[FigureDescriber._describe] failed: {err}")
+            self._count("failed")
+            return None
+        self._count("described")
+        for key in keys:
+            self.store.put_record(key, dict(description=description))
+            if key.startswith("figure_phash:"):
+                with self._lock:
+                    if self._phashes is not None:
+                        self._phashes[int(key[len("figure_phash:"):], 16)] = key
+        return description
+
+    def describe(self, figures: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """Descriptions for (caption, image url) pairs, in order (None where a figure couldn't be described)"""
+        print(f"[FigureDescriber.describe] {len(figures)} figures")
+        # --- download + hash (cached downloads are index lookups)
+        urls = list(dict.fromkeys(url for _, url in figures))
+        downloads = dict(zip(urls, run_parallel([lambda url=url: self._download(url) for url in urls], max_workers=self.concurrency)))
+        images = [downloads[url] for _, url in figures]
+        figure_keys = []
+        for (_, url), image in zip(figures, images):
+            if image == None:
+                figure_keys.append([f"figure_url:{url}"])
+                continue
+            keys = [f"figure:{image['content_hash']}"]
+            if "phash" not in image:
+                # computed once per image and kept alongside the download
+                image = { **image, "phash": perceptual_hash(self.store.get_blob(image["content_hash"])) }
+                self.store.put_record(f"bytes:{url}", image)
+            if image["phash"]:
+                keys.append(f"figure_phash:{image['phash']}")
+            figure_keys.append(keys)
+        # --- cached descriptions, and one vision call per unique uncached image
+        descriptions = [None] * len(figures)
+        pending = {} # dedupe key (perceptual hash if we have one) -> figure indexes sharing it
+        for i, keys in enumerate(figure_keys):
+            self._count("figures")
+            descriptions[i] = self._cached_description(keys)
+            if descriptions[i] != None:
+                self._count("cached")
+            elif keys[-1] in pending:
+                pending[keys[-1]].append(i)
+                self._count("deduped")
+            else:
+                pending[keys[-1]] = [i]
+        pending_idxs = list(pending.values())
+        results = run_parallel([lambda i=idxs[0]: self._describe(figures[i][0], figures[i][1], images[i], figure_keys[i]) for idxs in pending_idxs], max_workers=self.concurrency)
+        for idxs, description in zip(pending_idxs, results):
+            for i in idxs:
+                descriptions[i] = description
+        print(f"[FigureDescriber.describe] {self.stats}")
+        return descriptions
+
+
+_figure_describer = None
+_figure_describer_lock = threading.Lock()
+
+def get_figure_describer() -> FigureDescriber:
+    """Process-wide describer backed by the artifact store"""
+    global _figure_describer
+    with _figure_describer_lock:
+        if _figure_describer is None:
+            _figure_describer = FigureDescriber()
+    return _figure_describer
@@ -0,0 +1,265 @@
+import re
+import urllib.parse
+from typing import Dict, Iterator, List, Optional, Type
+from bs4 import BeautifulSoup
+from pydantic import BaseModel
+import soupsieve
+from .doi import doi_url
+
+try:
+    import lxml # noqa: F401 (C parser backend for BeautifulSoup, ~5-10x faster than html.parser)
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+
+# ##########################################
+# HTML PARSING
+# Journal HTML -> title, DOI and sections (title, text blocks, figures) without any LLM calls, so parsing stays cheap and
+# can be benchmarked/re-run on stored HTML. Selectors are compiled once at import, each section is walked once, and
+# text is normalized by collapsing whitespace. Figures are kept as a caption block + image URL, and Paper splices the
+# vision prompt's description in after that block.
+
+def make_soup(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, HTML_PARSER)
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace/newlines runs into single spaces"""
+    return " ".join(text.split())
+
+def _is_additional_section_title(title: str) -> bool:
+    # past main content (references, author info, ...), kept but excluded from fulltext
+    return title.lower() in ("reference", "references", "additional information", "acknowledgements", "acknowledgments", "author information")
+
+
+class ParsedFigure(BaseModel):
+    caption: str
+    context: Optional[str] = None # extra text for the vision prompt (ex: a figure description), not added to content
+    image_url: Optional[str] = None
+    block_idx: int # description gets spliced in after this block (the caption)
+
+class ParsedSection(BaseModel):
+    title: Optional[str] = None
+    blocks: List[str] = []
+    figures: List[ParsedFigure] = []
+    is_additional_section: bool = False
+
+
+# ##########################################
+# PARSERS
+# A parser is a set of compiled selectors for a publisher's markup. The base class walks it: title/DOI (with
+# citation_* meta tags as the fallback most publishers support), then each section's blocks (paragraphs, tables,
+# figures) in document order. Sections are yielded as they're parsed, so callers can stream them.
+
+class JournalParser():
+    domains: List[str] = []
+    base_url: str = None # for resolving relative image URLs (defaults to the page URL)
+    TITLE = soupsieve.compile("h1")
+    DOI = None # selector for an element holding the DOI (href if a link, else text)
+    SECTIONS = soupsieve.compile("article section")
+    SECTION_TITLE = soupsieve.compile("h2")
+    BLOCKS = soupsieve.compile(":is(p:not(figure p), figure)")
+    FIGURE = soupsieve.compile("figure")
+    FIGURE_CAPTION = soupsieve.compile("figcaption")
+    FIGURE_IMAGE = soupsieve.compile("img")
+    META_TITLE = soupsieve.compile("meta[name='citation_title'], meta[name='dc.Title' i], meta[property='og:title']")
+    META_DOI = soupsieve.compile("meta[name='citation_doi'], meta[name='dc.Identifier' i][scheme='doi' i], meta[name='prism.doi']")
+
+    def __init__(self, html: str, url: str = None):
+        self.url = url
+        self.soup = make_soup(html)
+
+    def title(self) -> Optional[str]:
+        title = self.TITLE.select_one(self.soup) if self.TITLE else None
+        if title and normalize_text(title.get_text()):
+            return normalize_text(title.get_text())
+        meta = self.META_TITLE.select_one(self.soup)
+        return (normalize_text(meta.attrs.get("content", "")) or None) if meta else None
+
+    def doi(self) -> Optional[str]:
+        element = self.DOI.select_one(self.soup) if self.DOI else None
+        if element:
+            return doi_url(element.attrs.get("href") or element.get_text())
+        meta = self.META_DOI.select_one(self.soup)
+        return doi_url(meta.attrs.get("content")) if meta else None
+
+    def image_url(self, figure) -> Optional[str]:
+        image = self.FIGURE_IMAGE.select_one(figure)
+        if image is None:
+            return None
+        # lazy-loaded images keep the real URL in a data attribute
+        src = image.attrs.get("data-src") or image.attrs.get("data-large") or image.attrs.get("src")
+        return urllib.parse.urljoin(self.base_url or self.url or "", src) if src else None
+
+    def parse_figure(self, figure, block_idx: int) -> ParsedFigure:
+        caption = self.FIGURE_CAPTION.select_one(figure)
+        return ParsedFigure(caption=normalize_text(caption.get_text(" ")) if caption else "", image_url=self.image_url(figure), block_idx=block_idx)
+
+    def parse_section(self, section, section_title: Optional[str]) -> ParsedSection:
+        blocks = []
+        figures = []
+        for block in self.BLOCKS.select(section):
+            if self.FIGURE.match(block):
+                figure = self.parse_figure(block, len(blocks))
+                figures.append(figure)
+                blocks.append(figure.caption)
+                continue
+            # ... text and tables (TODO: insert tables as structured data rather than free text)
+            blocks.append(normalize_text(block.get_text(" ")))
+        return ParsedSection(title=section_title, blocks=blocks, figures=figures)
+
+    def iter_sections(self) -> Iterator[ParsedSection]:
+        is_additional_section = False
+        for section in self.SECTIONS.select(self.soup):
+            section_title = self.SECTION_TITLE.select_one(section)
+            # skip if no header (ex: nested subsections, already included in their parent's content)
+            if section_title == None: continue
+            title = normalize_text(section_title.get_text())
+            if _is_additional_section_title(title):
+                is_additional_section = True
+            parsed = self.parse_section(section, title)
+            parsed.is_additional_section = is_additional_section
+            yield parsed
+
+    def parse(self) -> dict:
+        """Everything at once (title, doi, sections)"""
+        return dict(title=self.title(), doi=self.doi(), sections=list(self.iter_sections()))
+
+
+class GenericParser(JournalParser):
+    """Unknown publishers: meta tags for title/DOI, and the page's article (or body) paragraphs as one section"""
+    CONTENT = soupsieve.compile("article, main, [role='main']")
+
+    def iter_sections(self) -> Iterator[ParsedSection]:
+        root = self.CONTENT.select_one(self.soup) or self.soup.body or self.soup
+        parsed = self.parse_section(root, None)
+        if parsed.blocks:
+            yield parsed
+
+
+# --- registry (keyed by domain, matched against a URL's host and each parent domain)
+
+PARSER_REGISTRY: Dict[str, Type[JournalParser]] = {}
+
+def register_parser(parser_cls: Type[JournalParser]) -> Type[JournalParser]:
+    for domain in parser_cls.domains:
+        PARSER_REGISTRY[domain] = parser_cls
+    return parser_cls
+
+def get_parser_class(url: str) -> Type[JournalParser]:
+    """Parser registered for the URL's domain (ex: www.ncbi.nlm.nih.gov -> nih.gov), else the generic parser"""
+    labels = (urllib.parse.urlparse(url).hostname or "").lower().split(".")
+    for i in range(len(labels) - 1):
+        parser_cls = PARSER_REGISTRY.get(".".join(labels[i:]))
+        if parser_cls is not None:
+            return parser_cls
+    return GenericParser
+
+
+# ##########################################
+# PUBLISHERS
+
+@register_parser
+class NatureParser(JournalParser):
+    domains = ["nature.com"]
+    base_url = "https://www.nature.com/"
+    BLOCKS = soupsieve.compile(".c-article-section__content :is(p:not(figure p), figure)")
+    FIGURE_DESCRIPTION = soupsieve.compile(".c-article-section__figure-description")
+    BIBLIOGRAPHY_ITEMS = soupsieve.compile("li.c-bibliographic-information__list-item")
+    BIBLIOGRAPHY_VALUE = soupsieve.compile("span.c-bibliographic-information__value")
+
+    def doi(self) -> Optional[str]:
+        for item in self.BIBLIOGRAPHY_ITEMS.select(self.soup):
+            if "DOI" in item.get_text():
+                value = self.BIBLIOGRAPHY_VALUE.select_one(item)
+                if value:
+                    return doi_url(value.get_text())
+        return super().doi()
+
+    def parse_figure(self, figure, block_idx: int) -> ParsedFigure:
+        parsed = super().parse_figure(figure, block_idx)
+        description = self.FIGURE_DESCRIPTION.select_one(figure)
+        if description:
+            parsed.context = normalize_text(description.get_text(" "))
+        return parsed
+
+
+@register_parser
+class NIHParser(JournalParser):
+    """PubMed Central, classic (div.tsec) and current (section) markup"""
+    domains = ["nih.gov"]
+    base_url = "https://www.ncbi.nlm.nih.gov/"
+    DOI = soupsieve.compile("span.doi a[href]")
+    SECTIONS = soupsieve.compile("div.tsec.sec, section[id^='sec']:not(section section)")
+    BLOCKS = soupsieve.compile(":is(p.p, div.fig, div.table-wrap, section p:not(figure p), figure)")
+    FIGURE = soupsieve.compile("div.fig, figure")
+    FIGURE_CAPTION = soupsieve.compile(".caption, figcaption")
+
+
+@register_parser
+class ScienceDirectParser(JournalParser):
+    domains = ["sciencedirect.com"]
+    base_url = "https://www.sciencedirect.com/"
+    TITLE = soupsieve.compile("span.title-text, h1")
+    DOI = soupsieve.compile("a.doi[href]")
+    SECTIONS = soupsieve.compile("div#abstracts div.abstract, div#body section:not(section section)")
+    BLOCKS = soupsieve.compile(":is(div.u-margin-s-bottom, p:not(figure p, div.u-margin-s-bottom p), figure, div.tables)")
+    FIGURE_CAPTION = soupsieve.compile(".captions, figcaption")
+
+
+@register_parser
+class ACSParser(JournalParser):
+    domains = ["pubs.acs.org"]
+    base_url = "https://pubs.acs.org/"
+    TITLE = soupsieve.compile("h1.article_header-title, h1")
+    SECTIONS = soupsieve.compile("div.article_abstract, div.NLM_sec_level_1")
+    BLOCKS = soupsieve.compile(":is(div.NLM_p:not(figure div.NLM_p), p.articleBody_abstractText, figure)")
+
+
+@register_parser
+class MDPIParser(JournalParser):
+    domains = ["mdpi.com"]
+    base_url = "https://www.mdpi.com/"
+    TITLE = soupsieve.compile("h1.title, h1")
+    ABSTRACT = soupsieve.compile("div.html-abstract")
+    SECTIONS = soupsieve.compile("div.html-body > section")
+    BLOCKS = soupsieve.compile(":is(div.html-p, div.html-fig_wrap, div.html-table_wrap)")
+    FIGURE = soupsieve.compile("div.html-fig_wrap")
+    FIGURE_CAPTION = soupsieve.compile("div.html-caption")
+
+    def iter_sections(self) -> Iterator[ParsedSection]:
+        # the abstract has no h2, so it's titled here
+        abstract = self.ABSTRACT.select_one(self.soup)
+        if abstract:
+            yield ParsedSection(title="Abstract", blocks=[normalize_text(abstract.get_text(" "))])
+        yield from super().iter_sections()
+
+
+@register_parser
+class ArxivParser(JournalParser):
+    """arXiv HTML (LaTeXML, arxiv.org/html/...), which on /abs/ pages is just the abstract"""
+    domains = ["arxiv.org"]
+    TITLE = soupsieve.compile("h1.ltx_title_document, h1.title")
+    ABSTRACT = soupsieve.compile("div.ltx_abstract, blockquote.abstract")
+    SECTIONS = soupsieve.compile("section.ltx_section, section.ltx_appendix, section.ltx_bibliography")
+    BLOCKS = soupsieve.compile(":is(p.ltx_p:not(figure p), figure.ltx_figure, figure.ltx_table)")
+    FIGURE = soupsieve.compile("figure.ltx_figure")
+    ARXIV_ID_RE = re.compile(r"arxiv\.org/(?:abs|html|pdf)/([0-9]{4}\.[0-9]{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/[0-9]{7})")
+
+    def title(self) -> Optional[str]:
+        title = super().title()
+        return re.sub(r"^Title:\s*", "", title) if title else title
+
+    def doi(self) -> Optional[str]:
+        # every arXiv paper has a DataCite DOI (10.48550/arXiv.<id>)
+        doi = super().doi()
+        if doi:
+            return doi
+        match = self.ARXIV_ID_RE.search(self.url or "")
+        return doi_url(f"10.48550/arXiv.{match.group(1)}") if match else None
+
+    def iter_sections(self) -> Iterator[ParsedSection]:
+        abstract = self.ABSTRACT.select_one(self.soup)
+        if abstract:
+            yield ParsedSection(title="Abstract", blocks=[re.sub(r"^Abstract:?\s*", "", normalize_text(abstract.get_text(" ")))])
+        yield from super().iter_sections()
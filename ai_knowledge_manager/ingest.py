@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+from .agent_paper import PaperAgent
+from .clients import LLM_PROVIDER
+from .llm_trace import llm_run, llm_tracer
+from .metadata import metadata_stats
+from .paper import Paper
+from .persistence import JSONPersistence, SQLitePersistence
+from .rate_limit import set_llm_rate_limit
+from .record_log import RecordLog
+from .spans import span, span_tracer
+
+
+# ##########################################
+# BATCH INGESTION
+# Papers are loaded/parsed/processed concurrently, capped by `concurrency`. The prompt functions are synchronous,
+# so each paper's pipeline runs on a worker thread; LLM requests across all workers share the provider rate limiter.
+
+def ingest_paper(link: str, persistence, force: bool = False, on_paper: Callable[[Paper], None] = None) -> Paper:
+    """Load -> process a single paper (and hand it to `on_paper` for downstream steps, ex: MAML generation)"""
+    with llm_run("paper", link), span("paper", link=link):
+        ap = PaperAgent(persistence=persistence, refresh=False)
+        ap.load_paper(link=link)
+        ap.process_paper(force=force)
+        if on_paper != None:
+            on_paper(ap.paper)
+    return ap.paper
+
+async def ingest_papers_async(links: List[str], persistence, concurrency: int = 8, requests_per_minute: float = None, force: bool = False,
+                              on_paper: Callable[[Paper], None] = None, on_done: Callable[[str, Optional[Paper], Optional[Exception]], None] = None,
+                              return_papers: bool = True) -> List[Optional[Paper]]:
+    """Ingest papers concurrently. Returns papers in the same order as links, None for papers that failed.
+        `on_done(link, paper, error)` is called as each paper finishes. Large runs can pass return_papers=False to not hold every paper in memory.
+    """
+    print(f"[ingest_papers_async] {len(links)} papers (concurrency={concurrency}, requests_per_minute={requests_per_minute})")
+    if requests_per_minute != None:
+        set_llm_rate_limit(LLM_PROVIDER, requests_per_minute)
+    persistence.load_paper_graph() # load once, shared by every worker
+    semaphore = asyncio.Semaphore(concurrency)
+    start_time = time.time()
+    num_succeeded = 0
+
+    async def ingest_one(link: str):
+        nonlocal num_succeeded
+        async with semaphore:
+            try:
+                paper = await asyncio.to_thread(ingest_paper, link, persistence, force, on_paper)
+            except Exception as err:
+                print(f"[ingest_papers_async] failed: {link}, {err}")
+                if on_done != None:
+                    on_done(link, None, err)
+                return None
+            num_succeeded += 1
+            if on_done != None:
+                on_done(link, paper, None)
+            return paper if return_papers else None
+
+    papers = await asyncio.gather(*[ingest_one(link) for link in links])
+    print(f"[ingest_papers_async] {num_succeeded}/{len(links)} papers in {time.time() - start_time} seconds")
+    return papers
+
+def ingest_papers(links: List[str], persistence, **kwargs) -> List[Optional[Paper]]:
+    """Synchronous wrapper around ingest_papers_async"""
+    return asyncio.run(ingest_papers_async(links, persistence, **kwargs))
+
+
+# ##########################################
+# SOURCE DISCOVERY
+# Directories are walked for paper files (.pdf/.txt). URL lists are ".urls" files with one link per line ('#' comments).
+
+PAPER_FILE_EXTENSIONS = (".pdf", ".txt")
+URL_LIST_EXTENSIONS = (".urls",)
+
+def read_url_list(path: str) -> List[str]:
+    with open(path, 'r') as file:
+        return [line.strip() for line in file if line.strip() and not line.strip().startswith("#")]
+
+def discover_sources(paths: List[str]) -> List[str]:
+    """Paper links (file paths and URLs) from a mix of directories, paper files, URL lists and URLs. De-duplicated, in discovery order"""
+    links = []
+    def add_file(path: str):
+        if path.lower().endswith(URL_LIST_EXTENSIONS):
+            links.extend(read_url_list(path))
+        elif path.lower().endswith(PAPER_FILE_EXTENSIONS):
+            links.append(path)
+    for path in paths:
+        if path.startswith("http://") or path.startswith("https://"):
+            links.append(path)
+        elif os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    add_file(os.path.join(dir_path, file_name))
+        elif os.path.isfile(path):
+            add_file(path)
+        else:
+            print(f"[discover_sources] not found, skipping: {path}")
+    return list(dict.fromkeys(links))
+
+
+# ##########################################
+# CHECKPOINT + PROGRESS
+# Each finished link is recorded (done/failed) in a RecordLog, so an interrupted run picks up where it stopped.
+# Failed links are retried on the next run.
+
+class IngestCheckpoint():
+    def __init__(self, path: str):
+        self._log = RecordLog(path)
+        self._log.load()
+
+    def is_done(self, link: str) -> bool:
+        return (self._log.data.get(link) or {}).get("status") == "done"
+
+    def mark(self, link: str, paper: Optional[Paper], error: Optional[Exception]):
+        if error == None:
+            self._log.put(link, dict(status="done", paper_id=paper.id if paper != None else None, at=time.time()))
+        else:
+            self._log.put(link, dict(status="failed", error=str(error), at=time.time()))
+
+
+class IngestProgress():
+    """Papers/min and tokens/min over a run, printed every `report_every` papers"""
+    def __init__(self, total: int, report_every: int = 10):
+        self.total = total
+        self.report_every = report_every
+        self.done = 0
+        self.failed = 0
+        self._start_time = time.time()
+        self._start_tokens = llm_tracer.total_tokens()
+        self._lock = threading.Lock()
+
+    def record(self, error: Optional[Exception]):
+        with self._lock:
+            if error == None:
+                self.done += 1
+            else:
+                self.failed += 1
+            if (self.done + self.failed) % self.report_every == 0 or self.done + self.failed == self.total:
+                self.print()
+
+    def print(self):
+        minutes = max(time.time() - self._start_time, 1e-9) / 60
+        tokens = llm_tracer.total_tokens() - self._start_tokens
+        print(f"[IngestProgress] {self.done + self.failed}/{self.total} ({self.failed} failed) | "
+              f"{self.done / minutes:.1f} papers/min | {tokens / minutes:.0f} tokens/min | {minutes:.1f} min elapsed")
+
+
+def ingest_sources(paths: List[str], persistence, checkpoint_path: str = None, report_every: int = 10, force: bool = False, **kwargs) -> dict:
+    """Discover papers under paths and ingest the ones not already processed (per persistence and checkpoint)"""
+    links = discover_sources(paths)
+    checkpoint = IngestCheckpoint(checkpoint_path) if checkpoint_path else None
+    persistence.load_paper_graph()
+    # --- skip what's already stored + processed (or finished in a prior run)
+    pending = []
+    for link in links:
+        if force != True:
+            if checkpoint != None and checkpoint.is_done(link):
+                continue
+            paper = persistence.retrieve_paper_by_link(link)
+            if paper != None and paper.describes_process != None:
+                continue
+        pending.append(link)
+    print(f"[ingest_sources] {len(links)} discovered, {len(links) - len(pending)} already ingested, {len(pending)} pending")
+    progress = IngestProgress(total=len(pending), report_every=report_every)
+
+    def on_done(link: str, paper: Optional[Paper], error: Optional[Exception]):
+        if checkpoint != None:
+            checkpoint.mark(link, paper, error)
+        progress.record(error)
+
+    ingest_papers(pending, persistence, force=force, on_done=on_done, return_papers=False, **kwargs)
+    progress.print()
+    metadata_stats.print()
+    llm_tracer.print_summary("prompt")
+    span_tracer.print_summary()
+    return dict(discovered=len(links), skipped=len(links) - len(pending), ingested=progress.done, failed=progress.failed)
+
+
+# ##########################################
+# CLI
+# python -m ai_knowledge_manager.ingest ./data/papers [more dirs/files/.urls lists/urls] [--concurrency 8] [--sqlite ./data/caches/papers.sqlite]
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Ingest papers (.pdf/.txt files, .urls lists, URLs) into the paper store")
+    parser.add_argument("paths", nargs="+", help="directories, paper files, .urls lists or URLs")
+    parser.add_argument("--cache-path", default="./data/caches/papers.json", help="JSON paper store")
+    parser.add_argument("--sqlite", default=None, help="use a SQLite store at this path instead of the JSON store")
+    parser.add_argument("--checkpoint", default="./data/caches/ingest_checkpoint.json", help="progress file for resuming interrupted runs")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-minute", type=float, default=None)
+    parser.add_argument("--report-every", type=int, default=10, help="print throughput every N papers")
+    parser.add_argument("--force", action="store_true", help="re-process papers even if already ingested")
+    parser.add_argument("--trace", default=None, help="write timing spans as Chrome trace-event JSON to this path")
+    args = parser.parse_args(argv)
+
+    persistence = SQLitePersistence(db_path=args.sqlite) if args.sqlite else JSONPersistence(cache_path=args.cache_path)
+    results = ingest_sources(args.paths, persistence, checkpoint_path=args.checkpoint, report_every=args.report_every, force=args.force,
+                             concurrency=args.concurrency, requests_per_minute=args.requests_per_minute)
+    print(f"[ingest] {results}")
+    if args.trace:
+        span_tracer.export_chrome_trace(args.trace)
+
+if __name__ == "__main__":
+    main()
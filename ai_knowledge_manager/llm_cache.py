@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import openai
+from openai.types.chat import ChatCompletion
+from .llm_trace import current_prompt, llm_tracer
+from .rate_limit import get_llm_rate_limiter
+from .spans import span
+
+
+# ##########################################
+# LLM RESPONSE CACHE
+# Disk-backed, content-addressed cache for chat completions. Keys are a hash of the provider and request kwargs
+# (model, messages, response_format, max_tokens, temperature, ...) so identical prompts are only paid for once.
+# Entries expire after a TTL, and the least recently used entries are evicted once the cache exceeds its size bound.
+
+# Configured through env (read lazily, so values from .env loaded by clients.py apply):
+# LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES
+LLM_CACHE_PATH_DEFAULT = "./data/caches/llm_responses.sqlite"
+LLM_CACHE_TTL_SECONDS_DEFAULT = 60 * 60 * 24 * 30 # 30 days
+LLM_CACHE_MAX_BYTES_DEFAULT = 512 * 1024 * 1024
+
+
+def llm_request_key(provider: str, request_kwargs: dict) -> str:
+    """Hash a chat completion request into a stable cache key"""
+    payload = json.dumps({ "provider": provider, **request_kwargs }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache():
+    def __init__(self, path: str = LLM_CACHE_PATH_DEFAULT, ttl_seconds: float = LLM_CACHE_TTL_SECONDS_DEFAULT, max_bytes: int = LLM_CACHE_MAX_BYTES_DEFAULT):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+        self._db.commit()
+
+    def get(self, key: str):
+        """Return the cached response JSON for a key, or None if missing/expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str):
+        """Store a response JSON string, evicting least recently used entries if over the size bound"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)", (key, response, len(response), now, now))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        # walk oldest-accessed first until we're back under the bound
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+# ##########################################
+# CLIENT WRAPPER
+# Mirrors the `client.chat.completions.create(...)` surface used by the prompt modules, so the cache is transparent.
+# Requests that do go to the network wait on the provider's rate limiter first, transient errors are retried with
+# backoff, and every call (hit or not) is traced (llm_trace.py).
+
+RETRYABLE_LLM_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) # APITimeoutError is an APIConnectionError
+
+class _CachedCompletions():
+    def __init__(self, client, provider: str, cache: LLMResponseCache, max_retries: int = 2):
+        # retries happen here rather than inside the client, so each one is rate limited and traced
+        self._client = client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+        self._provider = provider
+        self._cache = cache
+        self.max_retries = max_retries
+
+    def _create_with_retries(self, kwargs: dict):
+        for attempt in range(self.max_retries + 1):
+            get_llm_rate_limiter(self._provider).acquire()
+            try:
+                return self._client.chat.completions.create(**kwargs), attempt
+            except Exception as err:
+                err.llm_retries = attempt # retries made before this error, for tracing
+                if attempt == self.max_retries or not isinstance(err, RETRYABLE_LLM_ERRORS):
+                    raise
+                backoff_s = min(0.5 * 2 ** attempt, 8.0) * (1 + random.random() * 0.25)
+                print(f"[CachedLLMClient] {type(err).__name__}, retrying in {backoff_s:.1f}s")
+                time.sleep(backoff_s)
+
+    def create(self, **kwargs):
+        prompt = current_prompt() or "unnamed" # set by @traced_prompt on the calling prompt function
+        with span("llm", prompt=prompt, model=kwargs.get("model")):
+            return self._create(prompt, kwargs)
+
+    def _create(self, prompt: str, kwargs: dict):
+        model = kwargs.get("model")
+        start_time = time.perf_counter()
+        key = llm_request_key(self._provider, kwargs) if self._cache is not None else None
+        cached = self._cache.get(key) if self._cache is not None else None
+        if cached is not None:
+            response = ChatCompletion.model_validate_json(cached)
+            llm_tracer.record(prompt, self._provider, model, response, latency_s=time.perf_counter() - start_time, cached=True)
+            return response
+        try:
+            response, retries = self._create_with_retries(kwargs)
+        except Exception as err:
+            llm_tracer.record(prompt, self._provider, model, latency_s=time.perf_counter() - start_time, retries=getattr(err, "llm_retries", 0), error=f"{type(err).__name__}: {err}")
+            raise
+        llm_tracer.record(prompt, self._provider, model, response, latency_s=time.perf_counter() - start_time, retries=retries)
+        if self._cache is not None:
+            self._cache.set(key, response.model_dump_json())
+        return response
+
+
+class _CachedChat():
+    def __init__(self, completions: _CachedCompletions):
+        self.completions = completions
+
+
+class CachedLLMClient():
+    def __init__(self, client, provider: str, cache: LLMResponseCache = None, max_retries: int = 2):
+        self.client = client
+        self.provider = provider
+        self.cache = cache
+        self.chat = _CachedChat(_CachedCompletions(client, provider, cache, max_retries=max_retries))
+
+    def __getattr__(self, name):
+        # anything other than chat completions (embeddings, models, ...) goes straight to the underlying client
+        return getattr(self.client, name)
+
+
+_llm_response_cache = None
+_llm_response_cache_lock = threading.Lock()
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """Process-wide cache instance, shared by every clients.py"""
+    global _llm_response_cache
+    with _llm_response_cache_lock:
+        if _llm_response_cache is None:
+            _llm_response_cache = LLMResponseCache(
+                path=os.environ.get("LLM_CACHE_PATH", LLM_CACHE_PATH_DEFAULT),
+                ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", LLM_CACHE_TTL_SECONDS_DEFAULT)),
+                max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", LLM_CACHE_MAX_BYTES_DEFAULT)))
+    return _llm_response_cache
+
+_wrapped_clients = {}
+
+def wrap_llm_client(client, provider: str):
+    """Wrap a client with the provider's rate limiter, retries (LLM_MAX_RETRIES), tracing, and the response cache
+        (unless disabled via LLM_CACHE_ENABLED=false). Wrappers are reused per client
+    """
+    cache_enabled = os.environ.get("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+    key = (id(client), provider, cache_enabled)
+    with _llm_response_cache_lock:
+        wrapped = _wrapped_clients.get(key)
+    if wrapped is None:
+        wrapped = CachedLLMClient(client, provider, get_llm_response_cache() if cache_enabled else None, max_retries=int(os.environ.get("LLM_MAX_RETRIES", 2)))
+        with _llm_response_cache_lock:
+            _wrapped_clients[key] = wrapped
+    return wrapped
@@ -0,0 +1,141 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+# ##########################################
+# LLM CALL TRACING
+# Every chat completion through a wrapped client (see llm_cache.py) is recorded: prompt function, model, tokens,
+# latency, retries, cache hit and estimated cost. Calls are named after the @traced_prompt function they're made in,
+# and attributed to the paper/MAML/TEA run they happen in (`with llm_run("paper", link):`), aggregated per prompt/model/run for a summary report, and streamed to a JSONL
+# trace file when LLM_TRACE_PATH is set (or set_trace_path is called).
+
+# USD per 1M tokens (input, output). Models not listed are traced w/o a cost
+LLM_PRICING = {
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4-1106-preview": (10.0, 30.0),
+    "gpt-4-0125-preview": (10.0, 30.0),
+    "gpt-4-vision-preview": (10.0, 30.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (5.0, 15.0),
+    "gpt-4": (30.0, 60.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "deepseek-chat": (0.27, 1.1),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+    "text-embedding-ada-002": (0.1, 0.0),
+}
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD for a call, matching the longest priced model name the model starts with"""
+    matches = [name for name in LLM_PRICING if (model or "").startswith(name)]
+    if not matches:
+        return None
+    input_price, output_price = LLM_PRICING[max(matches, key=len)]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+_current_run = contextvars.ContextVar("llm_run", default=(None, None))
+
+@contextlib.contextmanager
+def llm_run(kind: str, run_id: str):
+    """Attribute LLM calls made inside this block (and threads started via run_parallel/asyncio.to_thread) to a run"""
+    token = _current_run.set((kind, run_id))
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+
+
+_current_prompt = contextvars.ContextVar("llm_prompt", default=None)
+
+def traced_prompt(fn):
+    """Decorator naming the LLM calls made inside a prompt function after it"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current_prompt.set(fn.__name__)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_prompt.reset(token)
+    return wrapper
+
+def current_prompt() -> Optional[str]:
+    return _current_prompt.get()
+
+
+class LLMTracer():
+    def __init__(self, trace_path: str = None, max_recent: int = 1000):
+        self.trace_path = trace_path
+        self.recent = deque(maxlen=max_recent) # last N call records, the full history is the trace file
+        self._lock = threading.Lock()
+        self.clear()
+
+    def set_trace_path(self, trace_path: Optional[str]):
+        with self._lock:
+            self.trace_path = trace_path
+
+    def record(self, prompt: str, provider: str, model: str, response=None, latency_s: float = 0.0, retries: int = 0, cached: bool = False, error: str = None):
+        usage = getattr(response, "usage", None)
+        prompt_tokens = (usage.prompt_tokens or 0) if usage is not None else 0
+        completion_tokens = (getattr(usage, "completion_tokens", 0) or 0) if usage is not None else 0 # embeddings have none
+        run_kind, run_id = _current_run.get()
+        cost = 0.0 if cached else llm_cost(getattr(response, "model", None) or model, prompt_tokens, completion_tokens) if response is not None else None
+        record = dict(ts=time.time(), run_kind=run_kind, run_id=run_id, prompt=prompt, provider=provider, model=model,
+                      prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, latency_s=round(latency_s, 4),
+                      retries=retries, cached=cached, error=error, cost_usd=cost)
+        with self._lock:
+            self.recent.append(record)
+            for group, key in (("prompt", prompt), ("model", model), ("run", f"{run_kind}:{run_id}" if run_kind else None)):
+                totals = self._totals[group].setdefault(key, dict(calls=0, cached=0, errors=0, retries=0, prompt_tokens=0, completion_tokens=0, latency_s=0.0, cost_usd=0.0))
+                totals["calls"] += 1
+                totals["cached"] += int(cached)
+                totals["errors"] += int(error is not None)
+                totals["retries"] += retries
+                if not cached:
+                    totals["prompt_tokens"] += prompt_tokens
+                    totals["completion_tokens"] += completion_tokens
+                totals["latency_s"] += latency_s
+                totals["cost_usd"] += cost or 0.0
+            trace_path = self.trace_path if self.trace_path is not None else os.environ.get("LLM_TRACE_PATH") # env read lazily, after .env loads
+            if trace_path:
+                with open(trace_path, 'a') as file:
+                    file.write(json.dumps(record) + "\n")
+
+    def total_tokens(self) -> int:
+        """Tokens sent/received over the network (cache hits excluded) across all calls"""
+        with self._lock:
+            return sum(t["prompt_tokens"] + t["completion_tokens"] for t in self._totals["model"].values())
+
+    def summary(self, group_by: str = "prompt") -> dict:
+        """Totals per prompt, model or run ('kind:id'), most expensive (then slowest) first"""
+        with self._lock:
+            totals = { key: dict(value) for key, value in self._totals[group_by].items() }
+        for value in totals.values():
+            value["latency_s"] = round(value["latency_s"], 3)
+            value["cost_usd"] = round(value["cost_usd"], 4)
+        return dict(sorted(totals.items(), key=lambda item: (-item[1]["cost_usd"], -item[1]["latency_s"])))
+
+    def print_summary(self, group_by: str = "prompt"):
+        for key, value in self.summary(group_by).items():
+            print(f"[LLMTracer] {group_by}={key} | calls={value['calls']} (cached={value['cached']}, errors={value['errors']}, retries={value['retries']}) | "
+                  f"tokens in/out={value['prompt_tokens']}/{value['completion_tokens']} | {value['latency_s']}s | ${value['cost_usd']}")
+
+    def export_summary(self, path: str):
+        """Write summaries (per prompt, model and run) as a JSON report"""
+        with open(path, 'w') as file:
+            json.dump({ group_by: self.summary(group_by) for group_by in ("prompt", "model", "run") }, file, indent=2)
+
+    def clear(self):
+        with self._lock:
+            self.recent.clear()
+            self._totals = dict(prompt={}, model={}, run={})
+
+
+llm_tracer = LLMTracer()
@@ -0,0 +1,119 @@
+import re
+import threading
+from collections import Counter
+from typing import Optional, Tuple
+from .doi import doi_url, normalize_doi
+
+
+# ##########################################
+# LOCAL METADATA EXTRACTION
+# Title + DOI from a paper's opening text (and PDF metadata when there is some) with regexes/heuristics. Each guess
+# comes with a confidence, and only "low" confidence guesses escalate to the LLM. Stats record how each was found.
+
+# Crossref's recommended pattern (matches ~all modern DOIs), w/o the anchors
+DOI_RE = re.compile(r"10\.\d{4,9}/[-._;()/:A-Z0-9]+", re.IGNORECASE)
+DOI_LABEL_RE = re.compile(r"(doi\s*:?\s*|doi\.org/|/doi/(abs/|full/|pdf/)?)$", re.IGNORECASE)
+HEADER_MAX_CHARS = 8000 # ~first couple of pages, past that DOIs are usually references
+
+# lines at the top of a paper that aren't its title
+NON_TITLE_LINE_RE = re.compile(r"^(research( article)?|original (research|article)|review( article)?|article|open access|published|received|accepted|"
+                               r"available online|contents lists|copyright|©|doi|https?:|www\.|journal of|vol(ume)?\b|keywords|abstract|\d)", re.IGNORECASE)
+TRAILING_AUTHORS_RE = re.compile(r"(\s+[A-Z]{1,3}\.?\s[A-Z][\w\-']+,)+\s+[A-Z]{1,3}\.?\s[A-Z][\w\-']+$") # "... sugarcane H Huang, S Long, V Singh"
+PDF_METADATA_BAD_TITLE_RE = re.compile(r"(^microsoft word|^untitled|\.(docx?|pdf|tex|dvi)$|^[\w\-]+$)", re.IGNORECASE)
+
+
+def clean_doi(doi: str) -> str:
+    """Trim what the regex over-captures at the end of a DOI in running text (sentence punctuation, unbalanced parens,
+        a word glued on by PDF extraction, ex: '10.3389/fenrg.2018.00129Bioconversion'), then normalize_doi it"""
+    doi = re.sub(r"(?<=\d)[A-Z][a-z]{2,}$", "", doi) # before normalizing, which lowercases
+    doi = doi.rstrip(".,;:")
+    while doi.endswith(")") and doi.count(")") > doi.count("("):
+        doi = doi[:-1].rstrip(".,;:")
+    return normalize_doi(doi)
+
+def extract_doi(text: str, pdf_metadata: dict = None) -> Tuple[Optional[str], str, str]:
+    """(doi url, confidence, method) from PDF metadata or the opening text"""
+    # --- PDF metadata (publishers often put "doi:10..." in the subject/identifier)
+    for value in (pdf_metadata or {}).values():
+        match = DOI_RE.search(value or "")
+        if match:
+            return doi_url(clean_doi(match.group())), "high", "pdf_metadata"
+    # --- opening text, preferring DOIs that are labeled as such (vs. cited)
+    header = text[0:HEADER_MAX_CHARS]
+    labeled = Counter()
+    unlabeled = Counter()
+    first_seen = {}
+    for match in DOI_RE.finditer(header):
+        doi = clean_doi(match.group())
+        first_seen.setdefault(doi, match.start())
+        if DOI_LABEL_RE.search(header[max(0, match.start() - 12):match.start()]):
+            labeled[doi] += 1
+        else:
+            unlabeled[doi] += 1
+    # headers/footers get cut off (ex: "DOI: 10.1002/bbb" vs "10.1002/bbb.1640"), so fold prefixes into the longer DOI
+    for counts in (labeled, unlabeled):
+        for doi in list(counts):
+            longer = [other for other in counts if other != doi and other.startswith(doi) and re.match(r"[./\-_0-9]", other[len(doi)])]
+            if longer:
+                counts[max(longer, key=len)] += counts.pop(doi)
+    for counts, confidence in ((labeled, "high"), (unlabeled, "low")):
+        if counts:
+            doi = max(counts, key=lambda d: (counts[d], -first_seen[d]))
+            if confidence == "high" and len(counts) > 1:
+                confidence = "medium"
+            return doi_url(doi), confidence, "regex"
+    return None, "low", "regex"
+
+def extract_title(text: str, pdf_metadata: dict = None) -> Tuple[Optional[str], str, str]:
+    """(title, confidence, method) from PDF metadata or the first heading-like line"""
+    title = " ".join(((pdf_metadata or {}).get("title") or "").split())
+    if len(title.split()) >= 4 and not PDF_METADATA_BAD_TITLE_RE.search(title):
+        return title, "high", "pdf_metadata"
+    for line in text[0:2000].splitlines()[0:15]:
+        line = " ".join(line.split()).strip('"')
+        if not line or NON_TITLE_LINE_RE.search(line):
+            continue
+        line = TRAILING_AUTHORS_RE.sub("", line)
+        words = line.split()
+        # titles are a sentence-ish run of words, w/o the emails/affiliation separators of author lines
+        if 4 <= len(words) <= 40 and "@" not in line and line.count(";") == 0 and not line.endswith("."):
+            return line, "medium", "heading"
+        break # first real line isn't title-like, don't guess further down
+    return None, "low", "heading"
+
+def extract_title_and_doi(text: str, pdf_metadata: dict = None) -> dict:
+    # text dumped from JSON/HTML scrapes can carry literal "\n"s
+    if text.count("\\n") > text.count("\n"):
+        text = text.replace("\\n", "\n")
+    return dict(title=extract_title(text, pdf_metadata), doi=extract_doi(text, pdf_metadata))
+
+
+# --- stats (how often each field was found locally vs. needed the LLM)
+
+class MetadataStats():
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, field: str, method: str):
+        with self._lock:
+            self.counts[(field, method)] += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = {}
+            for (field, method), count in self.counts.items():
+                summary.setdefault(field, {})[method] = count
+            for field, methods in summary.items():
+                methods["llm_fallback_rate"] = round(methods.get("llm", 0) / sum(methods.values()), 3)
+            return summary
+
+    def print(self):
+        for field, methods in self.summary().items():
+            print(f"[MetadataStats] {field}: {methods}")
+
+    def clear(self):
+        with self._lock:
+            self.counts.clear()
+
+metadata_stats = MetadataStats()
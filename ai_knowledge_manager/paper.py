@@ -1,16 +1,38 @@
-from bs4 import BeautifulSoup
+import bisect
 from pydantic import BaseModel, Field
 from typing import List, Optional
-import pypdf
 import urllib.parse
-import yaml
-from .prompts import prompt_detail_extraction, prompt_figure_description
+from .artifacts import get_artifact_store
+from .context import build_text_context
+from .doi import normalize_doi # noqa: F401 (re-exported, persistence imports it from here)
+from .figures import get_figure_describer
+from .html_parsing import get_parser_class
+from .metadata import extract_title_and_doi, metadata_stats
+from .pdf import extract_pdf_text, read_pdf_metadata
+from .retrieval import chunk_spans
+from .prompts import prompt_detail_extraction
 from .scrapers import scrape_sync
 
 
+DOI_QUERY = "DOI doi.org digital object identifier"
+PDF_TEXT_EXTRACTOR = "pypdf.read_pdf_pages.v3" # bump when read_pdf_pages changes so stored extractions are redone
+
+
 class Section(BaseModel):
     is_additional_section: bool
+    title: Optional[str] = None
     content: str
+    page_offsets: Optional[List[int]] = None # for PDFs, offset in content where each page starts
+
+    def page_at(self, offset: int) -> Optional[int]:
+        """Page number (0-indexed) a content offset falls on, None if pages aren't known"""
+        if not self.page_offsets:
+            return None
+        return bisect.bisect_right(self.page_offsets, offset) - 1
+
+class Chunk(BaseModel):
+    start: int # char span into Paper.fulltext()
+    end: int
 
 class PaperSource(BaseModel):
     link: str
@@ -23,6 +45,7 @@ class Paper(BaseModel):
     html: Optional[str] = None
     title: Optional[str] = None
     sections: List[Section] = [] #TODO: Rename to accessible_text
+    chunks: List[Chunk] = [] # sentence-window spans over fulltext() for retrieving relevant text per prompt
     references: List[str] = [] # Might discard but keeping for now
     doi: Optional[str] = None
     text_abstract: Optional[str] = None
@@ -50,8 +73,8 @@ class Paper(BaseModel):
         # V1: requests (doesn't work if delay loading)
         # html = requests.get(url)
         # self.html = html.text
-        # V2: pyppeteer (works with delay loading)
-        self.html = scrape_sync(url)
+        # V2: pyppeteer (works with delay loading), stored raw so re-parsing doesn't re-scrape
+        self.html = get_artifact_store().fetch_html(url, scrape_sync)
 
     def fulltext(self) -> str:
         """Return title and sections content as single string"""
@@ -62,6 +85,16 @@ class Paper(BaseModel):
         sections_to_join = filter(lambda section: not section.is_additional_section, self.sections)
         return title + "\n\n" + "\n\n".join([section.content for section in sections_to_join])
 
+    def build_chunks(self):
+        """Chunk fulltext into sentence windows for retrieval (spans only, text stays in sections)"""
+        self.chunks = [Chunk(start=start, end=end) for start, end in chunk_spans(self.fulltext())]
+
+    def retrieve(self, query: str, max_tokens: int, name: str = "paper") -> str:
+        """Return the chunks of the paper most relevant to a query, within a token budget"""
+        if not self.chunks:
+            self.build_chunks()
+        return build_text_context(self.fulltext(), query, max_tokens, name=name, spans=[(c.start, c.end) for c in self.chunks])
+
     def get_paper_data(self):
         print("[Paper.get_paper_data]")
         return self.dict()
@@ -69,28 +102,42 @@ class Paper(BaseModel):
     def parse_text(self, text: str):
         """Hacky way to grab text and get the basic structure for now"""
         print("[Paper.parse_text]")
-        self.title = prompt_detail_extraction(text[0:500], "What is the title of this paper?")
-        self.doi = prompt_detail_extraction(text, "What is the DOI for this paper? (Ex: https://doi.org/10.1038/srep20361, https://doi.org/10.4161/bioe.19874)")
-        self.id = self.doi
         # HACK: just want text into this structure so i can use it downstream
-        self.sections = [{
-            "content": text,
-            "is_additional_section": False,
-        }]
+        self.sections = [Section(content=text, is_additional_section=False)]
+        self.set_title_and_doi(text)
+        self.build_chunks()
+
+    def set_title_and_doi(self, text: str, pdf_metadata: dict = None):
+        """Fill in title/DOI (where not already set) locally, only asking the LLM when the local guess is low confidence"""
+        # chunk spans index into fulltext(), which starts with the title, so any built before it's set are stale
+        self.chunks = []
+        found = extract_title_and_doi(text, pdf_metadata)
+        if not self.title:
+            title, confidence, method = found["title"]
+            if confidence == "low":
+                title, method = prompt_detail_extraction(text[0:500], "What is the title of this paper?"), "llm"
+            self.title = title
+            metadata_stats.record("title", method)
+        if not self.doi:
+            doi, confidence, method = found["doi"]
+            if confidence == "low":
+                doi, method = prompt_detail_extraction(self.retrieve(DOI_QUERY, max_tokens=1000, name="paper.doi"), "What is this paper's DOI as a valid URL? (Ex: https://doi.org/10.1038/srep20361, https://doi.org/10.4161/bioe.19874)"), "llm"
+            self.doi = doi
+            metadata_stats.record("doi", method)
+        if not self.id:
+            self.id = self.doi
 
     def parse(self):
-        """Determine which HTML parser to use based on URL"""
+        """Load + parse the source (URL, .txt or .pdf)"""
         print("[Paper.load]")
         #removed old cache check here.
         # URLS
-        if self.source.linktype == "url":
+        if self.source.linktype == "url" or self.source.link.startswith(("http://", "https://")):
+            self.source.linktype = "url"
             # --- load
-            self.load_html(self.url)
-            # --- parse URLs
-            if "nature.com" in self.url:
-                self.parse_html_nature()
-            if "nih.gov" in self.url:
-                self.parse_html_nih()
+            self.load_html(self.source.link)
+            # --- parse (publisher parser picked by domain)
+            self.parse_html()
             return
         # TEXT
         if ".txt" in self.source.link:
@@ -99,158 +146,55 @@ class Paper(BaseModel):
                 self.parse_text(text)
             return
         if ".pdf" in self.source.link:
-            text = self.read_pdf_basic(self.source.link)
-            self.parse_pdf(text)
+            # extracted text is stored keyed on the PDF's content + extractor, so re-parsing doesn't re-extract
+            pdf_pages = get_artifact_store().extract_json(self.source.link, self.read_pdf_pages, extractor=PDF_TEXT_EXTRACTOR)
+            self.parse_pdf(pdf_pages["text"], page_offsets=pdf_pages["page_offsets"], pdf_metadata=pdf_pages["metadata"])
             return
         print(f"Nothing loaded because source={self.source.dict()}")
 
-    def parse_pdf(self, text: str):
+    def parse_pdf(self, text: str, page_offsets: List[int] = None, pdf_metadata: dict = None):
         """Hacky way to grab text and get the basic structure for now"""
         print("[Paper.parse_pdf]")
-        if not self.title:
-            self.title = prompt_detail_extraction(text[0:500], "What is the title of this paper?")
-        if not self.doi:
-            self.doi = prompt_detail_extraction(text, "What is this paper's DOI as a valid URL? (Ex: https://doi.org/10.1038/srep20361, https://doi.org/10.4161/bioe.19874)")
-        if not self.id:
-            self.id = self.doi
-
         # HACK: just want text into this structure so i can use it downstream
-        self.sections = [{
-            "content": text,
-            "is_additional_section": False,
-        }]
+        self.sections = [Section(content=text, is_additional_section=False, page_offsets=page_offsets)]
+        # DOIs are searched for over the first couple pages
+        self.set_title_and_doi(text[0:page_offsets[2]] if page_offsets and len(page_offsets) > 2 else text, pdf_metadata=pdf_metadata)
+        self.build_chunks()
 
-    def read_pdf_basic(self, filename):
-        # Initialize an empty string to hold all text
-        output_text = ""
-        # Open the PDF file
-        with open(filename, "rb") as pdfFileObj:
-            # Create a PDF reader object
-            pdfReader = pypdf.PdfReader(pdfFileObj)
-            # Iterate through each page and append text to output_text
-            for page in pdfReader.pages:
-                page_text = page.extract_text() or ""  # Ensure we get a string even if None is returned
-                output_text += page_text
-        # Now output_text contains all text from the PDF
-        return output_text
+    def read_pdf_pages(self, filename) -> dict:
+        """Extract text from a PDF (pages in parallel) along with where each page starts in the text, and its metadata"""
+        text, page_offsets = extract_pdf_text(filename)
+        return dict(text=text, page_offsets=page_offsets, metadata=read_pdf_metadata(filename))
 
-    def parse_html_nature(self):
-        """HTML Parser: Nature Journal"""
-        soup = BeautifulSoup(self.html, "html.parser")
-        soup_article = soup.article #unused?
-        soup_article_header = soup.select("article div.c-article-header") #unused?
-        soup_article_body = soup.select("article div.c-article-body") #unused?
-        soup_article_body_sections = soup.select("article section")
-        soup_bibliography_items = soup.select("li.c-bibliographic-information__list-item")
-        soup_h1 = soup.h1
-        # --- compile content
-        self.title = soup_h1.text
-        self.doi = None
-        self.sections = []
-        self.references = []
-        # --- compile DOI (will be used as ID)
-        for item in soup_bibliography_items:
-            if 'DOI' in item.get_text():
-                doi_value_span = item.find('span', class_='c-bibliographic-information__value')
-                if doi_value_span:
-                    self.doi = doi_value_span.get_text().strip()
-                    self.id = self.doi
-                    break
-        # --- compile html elements after each h2
-        is_additional_section = False # note if a sections is past main content
-        for section in soup_article_body_sections:
-            section_h2 = section.find("h2")
-            # skip if no header
-            if section_h2 == None: continue
-            # stop compiling sections when we hit references, this focuses on content might be bad str
-            if section_h2.text == "Reference" or section_h2.text.lower() == "Additional Information":
-                is_additional_section = True
-                # TODO: parse links to cited papers if we need to pull additional info
-            # content prep
-            section_content = section.select(".c-article-section__content")
-            y = yaml.dump(section_content[0].text)
-            section_content_yaml = y.replace("\\\n  \\ ", "").replace("\n  ", "").strip()
-            # interpret figures and splice that into the section content
-            section_figures = section.select("figure")
-            for figure in section_figures:
-                figure_title_text = figure.select_one("figcaption").text
-                figure_description_select = figure.select(".c-article-section__figure-description")
-                figure_description_select_text = figure_description_select[0].text if len(figure_description_select) > 0 else None
-                # ... if an image TODO: not sure if we'll need to handle multiple images, for now assuming there's 1 per figure
-                figure_image_select = figure.select("img")
-                figure_image_select_url = figure_image_select[0].attrs["src"] if len(figure_image_select) > 0 else None
-                if figure_image_select_url != None:
-                    figure_image_structured_data = prompt_figure_description(f"{figure_title_text}, {figure_description_select_text}", "https:" + figure_image_select_url)
-                    section_content_yaml = section_content_yaml.replace(figure_title_text, figure_title_text + " " + figure_image_structured_data)
-                # ... TODO: if a table
-            # append to the yaml_sections
-            self.sections.append({
-                "html": str(section), # saving raw info if we want to reprocess/parse later
-                "title": section_h2.text,
-                "content": section_content_yaml,
-                "is_additional_section": is_additional_section # non-critical
-            })
-
-    def parse_html_nih(self):
-        """HTML Parser: NIH"""
-        soup = BeautifulSoup(self.html, "html.parser")
-        soup_article = soup.select_one("#mc") #unused?
-        soup_article_header = soup.select_one("h1") #unused?
-        soup_article_body = soup.select_one(".jig-ncbiinpagenav") #unused?
-        soup_bibliography_items = soup.select(".ref-cit-blk") #unused?
-        soup_article_body_sections = soup.select("div.tsec.sec")
-        soup_h1 = soup.h1
-        # --- compile content
-        self.title = soup_h1.text
-        self.doi = None
+    def read_pdf_basic(self, filename):
+        return extract_pdf_text(filename)[0]
+
+    def parse_html(self, describe_figures: bool = True):
+        """HTML Parser: picks the publisher's parser by domain (html_parsing registry)"""
+        parser = get_parser_class(self.source.link)(self.html, url=self.source.link)
+        print(f"[Paper.parse_html] {type(parser).__name__}")
+        self.title = parser.title()
+        self.doi = parser.doi()
+        if self.doi:
+            self.id = self.doi # (will be used as ID)
         self.sections = []
         self.references = []
-        # --- compile DOI (will be used as ID)
-        soup_doi = soup.select_one("span.doi a")
-        if soup_doi:
-            self.doi = urllib.parse.unquote("https:" + soup_doi.attrs["href"])
-            self.id = self.doi
-        # --- compile html elements after each h2
-        is_additional_section = False # note if a sections is past main content
-        for section in soup_article_body_sections:
-            section_h2 = section.find("h2")
-            # skip if no header
-            if section_h2 == None: continue
-            # stop compiling sections when we hit references, this focuses on content might be bad str
-            if section_h2.text == "References" or section_h2.text.lower() == "Additional Information":
-                is_additional_section = True
-                # TODO: parse links to cited papers if we need to pull additional info
-            # content prep
-            section_content = section.findChildren()
-            # ...since figures are weaving in-between paragraphs, we'll loop over both figures + text
-            section_content_yaml = ""
-            for section in section_content:
-                # ... if h2 or goto div, skip
-                if section.name == "h2" or "goto" in section.get("class", []):
-                    continue
-                # ... if text
-                if section.name == "p" and "p" in section.get("class", []):
-                    y = yaml.dump(section.text)
-                    section_content_yaml += y.replace("\\\n  \\ ", "").replace("\n  ", "").strip()
-                    section_content_yaml += "\n\n"
-                # ... if figure
-                if section.name == "div" and "fig" in section.get("class", []):
-                    figure_caption_text = section.select_one(".caption")
-                    figure_image_select = section.select_one("img")
-                    figure_image_select_url = figure_image_select.attrs["src"]
-                    if figure_image_select_url != None:
-                        figure_image_structured_data = prompt_figure_description(figure_caption_text, "https://www.ncbi.nlm.nih.gov" + figure_image_select_url)
-                        section_content_yaml += figure_image_structured_data
-                        section_content_yaml += "\n\n"
-                # ... if table (TODO: insert as structured data rather than free text)
-                if section.name == "div" and "table-wrap" in section.get("class", []):
-                    y = yaml.dump(section.text)
-                    section_content_yaml += y.replace("\\\n  \\ ", "").replace("\n  ", "").strip()
-                    section_content_yaml += "\n\n"
-            # append to the yaml_sections
-            self.sections.append({
-                "html": str(section), # saving raw info if we want to reprocess/parse later
-                "title": section_h2.text,
-                "content": section_content_yaml,
-                "is_additional_section": is_additional_section # non-critical
-            })
+        parsed_sections = list(parser.iter_sections())
+        # figure descriptions (cached per image, uncached ones described concurrently) get spliced in after their captions
+        figures = [(section_idx, figure) for section_idx, section in enumerate(parsed_sections) for figure in section.figures if figure.image_url != None] if describe_figures else []
+        descriptions = get_figure_describer().describe([(f"{figure.caption}, {figure.context}" if figure.context else figure.caption, figure.image_url) for _, figure in figures]) if figures else []
+        for (section_idx, figure), description in zip(figures, descriptions):
+            if description != None:
+                parsed_sections[section_idx].blocks[figure.block_idx] += "\n\n" + description
+        for section in parsed_sections:
+            self.sections.append(Section(
+                title=section.title,
+                content="\n\n".join(block for block in section.blocks if block),
+                is_additional_section=section.is_additional_section)) # non-critical
+        # only what the publisher markup/meta tags didn't cover falls back to the text heuristics/LLM
+        if self.title:
+            metadata_stats.record("title", "html")
+        if self.doi:
+            metadata_stats.record("doi", "html")
+        self.set_title_and_doi(self.fulltext())
+        self.build_chunks()
@@ -0,0 +1,19 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+
+# ##########################################
+# PARALLEL PROMPTS
+# LLM calls are network bound, so independent prompts can run on threads and take as long as the slowest one.
+# Each thread runs in a copy of the caller's context, so LLM calls stay attributed to the caller's run (llm_trace.py).
+
+def run_parallel(fns: List[Callable[[], object]], max_workers: int = None) -> List[object]:
+    """Run zero-arg callables concurrently and return their results in order. The first exception raised is re-raised.
+        Ex) meta, tags = run_parallel([lambda: prompt_paper_meta(text), lambda: prompt_tags_from_paper(text)])
+    """
+    if len(fns) <= 1:
+        return [fn() for fn in fns]
+    with ThreadPoolExecutor(max_workers=max_workers or len(fns)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, fn) for fn in fns]
+        return [future.result() for future in futures]
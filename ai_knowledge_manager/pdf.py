@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+import pypdf
+
+
+# ##########################################
+# PDF TEXT EXTRACTION
+# Pages are extracted in a process pool (pypdf is pure Python, so threads wouldn't help) in batches of
+# `pages_per_task`, and streamed back in page order. Joining records each page's starting offset in the text.
+
+def _extract_page_range(filename: str, start: int, end: int) -> List[str]:
+    # runs in a worker process, each opens its own reader
+    with open(filename, "rb") as pdf_file:
+        reader = pypdf.PdfReader(pdf_file)
+        return [(reader.pages[i].extract_text() or "") for i in range(start, end)] # Ensure we get a string even if None is returned
+
+def _count_pages(filename: str) -> int:
+    with open(filename, "rb") as pdf_file:
+        return len(pypdf.PdfReader(pdf_file).pages)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _worker_count() -> int:
+    return int(os.environ.get("PDF_EXTRACT_WORKERS", 0)) or os.cpu_count() or 1
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Process pool reused across PDFs (sized by PDF_EXTRACT_WORKERS, default cpu count)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn rather than fork, since callers (ex: batch ingestion) are often multi-threaded
+            _executor = ProcessPoolExecutor(max_workers=_worker_count(), mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def iter_pdf_pages(filename: str, pages_per_task: int = 8) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, page text) in page order as batches finish. Short PDFs (or single core boxes) are extracted in-process"""
+    num_pages = _count_pages(filename)
+    if num_pages <= pages_per_task * 2 or _worker_count() == 1:
+        for page_number, page_text in enumerate(_extract_page_range(filename, 0, num_pages)):
+            yield page_number, page_text
+        return
+    ranges = [(start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+    batches = _get_executor().map(_extract_page_range, [filename] * len(ranges), [r[0] for r in ranges], [r[1] for r in ranges])
+    for (start, _), page_texts in zip(ranges, batches):
+        for i, page_text in enumerate(page_texts):
+            yield start + i, page_text
+
+def read_pdf_metadata(filename: str) -> dict:
+    """Document info/XMP fields that can carry a title or DOI (values are None when missing/unreadable)"""
+    with open(filename, "rb") as pdf_file:
+        reader = pypdf.PdfReader(pdf_file)
+        info = {}
+        try:
+            info = { key.lstrip("/").lower(): str(value) for key, value in (reader.metadata or {}).items() if key in ("/Title", "/Subject", "/Keywords", "/doi", "/DOI") }
+        except Exception:
+            pass
+        try:
+            xmp = reader.xmp_metadata
+            if xmp != None and xmp.dc_identifier:
+                info["identifier"] = str(xmp.dc_identifier)
+        except Exception:
+            pass
+    return info
+
+def extract_pdf_text(filename: str, page_separator: str = "\n") -> Tuple[str, List[int]]:
+    """Full text of a PDF and the offset in that text where each page starts"""
+    parts = []
+    page_offsets = []
+    offset = 0
+    for _, page_text in iter_pdf_pages(filename):
+        page_offsets.append(offset)
+        parts.append(page_text)
+        offset += len(page_text) + len(page_separator)
+    return page_separator.join(parts), page_offsets
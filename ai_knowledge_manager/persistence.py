@@ -8,8 +8,13 @@ from gspread_dataframe import get_as_dataframe, set_with_dataframe
 import json
 import os
 import os.path
+import math
 import pickle
-from .paper import Paper, PaperSource
+import sqlite3
+import threading
+from typing import Iterator, List
+from .paper import Paper, PaperSource, normalize_doi
+from .record_log import RecordLog
 
 
 class Persistence:
@@ -31,29 +36,67 @@ class JSONPersistence(Persistence):
     def __init__(self, cache_path: str):
         self._paper_graph_path = cache_path
         self._paper_graph = None
+        self._paper_log = RecordLog(cache_path)
+        # secondary indexes (lookup value -> paper graph key), rebuilt on load and kept in sync on save
+        self._index_link = {}
+        self._index_doi = {}
+        self._index_doi_normalized = {}
+        self._index_id = {}
         self.load_paper_graph()
 
     def load_paper_graph(self):
         """Load paper graph cache for checking if we've parsed it already"""
         print("[JSONPersistence.load_paper_graph]")
-        # Create Graph Cache if None Exists
-        if os.path.exists(self._paper_graph_path) == False:
-            print("[JSONPersistence.load_paper_graph] No paper graph file found, creating one")
-            with open(self._paper_graph_path, 'w') as file:
-                json.dump({}, file)
-        # Load Graph Cache
-        with open(self._paper_graph_path, 'r') as file:
-            self._paper_graph = json.load(file)
+        # Load Graph Cache (snapshot + append-only log, created if none exists)
+        self._paper_graph = self._paper_log.load()
+        self.build_indexes()
 
-    def retrieve_paper_from_store(self, identifier):
-        # Loop over all the items in the file see if there's 
+    def build_indexes(self):
+        """Build secondary indexes over the paper graph so lookups don't scan every entry"""
+        self._index_link = {}
+        self._index_doi = {}
+        self._index_doi_normalized = {}
+        self._index_id = {}
         for key, value in self._paper_graph.items():
-            # print(f"Checking {value.get('file_path')} against {identifier}")
-            if value.get("source").get("link") == identifier:
-                print(f"[JSONPersistence.retrieve_paper_from_store] Paper loaded from cache: {value.get('source').get('link')}") 
-                # Create the pydantic class from dictionary
-                return Paper(**value)
-        return None
+            self._index_paper_data(key, value)
+
+    def _index_paper_data(self, key: str, paper_data: dict):
+        """Add a single paper graph entry to the secondary indexes"""
+        link = (paper_data.get("source") or {}).get("link")
+        if link:
+            self._index_link[link] = key
+        doi = paper_data.get("doi")
+        if doi:
+            self._index_doi[doi] = key
+            self._index_doi_normalized[normalize_doi(doi)] = key
+        self._index_id[paper_data.get("id") or key] = key
+
+    def _paper_from_key(self, key):
+        if key is None or key not in self._paper_graph:
+            return None
+        # Create the pydantic class from dictionary
+        return Paper(**self._paper_graph[key])
+
+    def retrieve_paper_by_link(self, link: str):
+        """Retrieve a paper by its source link (file path or URL)"""
+        return self._paper_from_key(self._index_link.get(link))
+
+    def retrieve_paper_by_doi(self, doi: str):
+        """Retrieve a paper by DOI, falling back to a normalized DOI match (ex: 'doi:10.1/X' == 'https://doi.org/10.1/x')"""
+        key = self._index_doi.get(doi)
+        if key is None:
+            key = self._index_doi_normalized.get(normalize_doi(doi))
+        return self._paper_from_key(key)
+
+    def retrieve_paper_by_id(self, paper_id: str):
+        """Retrieve a paper by its id"""
+        return self._paper_from_key(self._index_id.get(paper_id))
+
+    def retrieve_paper_from_store(self, identifier):
+        paper = self.retrieve_paper_by_link(identifier)
+        if paper is not None:
+            print(f"[JSONPersistence.retrieve_paper_from_store] Paper loaded from cache: {paper.source.link}")
+        return paper
 
     def save_paper(self, paper):
         """Save paper data to a JSON file in the cache directory"""
@@ -62,10 +105,265 @@ class JSONPersistence(Persistence):
         if not paper.doi:
             raise ValueError("DOI is missing for the paper")
         # Load a dict of the paper data
-        self._paper_graph[paper.id] = paper.get_paper_data()
-        # IO: Update JSON graph file
-        with open(self._paper_graph_path, 'w') as file:
-            json.dump(self._paper_graph, file, indent=4)
+        paper_data = paper.get_paper_data()
+        # IO: Append record to the graph log (updates self._paper_graph in place)
+        self._paper_log.put(paper.id, paper_data)
+        self._index_paper_data(paper.id, paper_data)
+
+
+# ####################################
+# LOCAL: SQLITE
+# Papers, MAMLs and TEA evals in a single database. Full records are kept as JSON, with the fields we filter on
+# (DOI, paper type, tags, TEA metrics) pulled out into indexed columns so queries don't load everything into memory.
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id TEXT PRIMARY KEY,
+    doi TEXT,
+    doi_normalized TEXT,
+    link TEXT,
+    title TEXT,
+    describes_process TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers (doi);
+CREATE INDEX IF NOT EXISTS idx_papers_doi_normalized ON papers (doi_normalized);
+CREATE INDEX IF NOT EXISTS idx_papers_link ON papers (link);
+CREATE INDEX IF NOT EXISTS idx_papers_describes_process ON papers (describes_process);
+CREATE TABLE IF NOT EXISTS paper_tags (
+    paper_id TEXT NOT NULL REFERENCES papers (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (paper_id, kind, tag)
+);
+CREATE INDEX IF NOT EXISTS idx_paper_tags_kind_tag ON paper_tags (kind, tag);
+CREATE TABLE IF NOT EXISTS mamls (
+    id TEXT PRIMARY KEY,
+    paper_id TEXT,
+    process_feedstock TEXT,
+    process_target TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mamls_paper_id ON mamls (paper_id);
+CREATE TABLE IF NOT EXISTS tea_evals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    maml_id TEXT NOT NULL,
+    level INTEGER,
+    production_costs REAL,
+    minimal_selling_price REAL,
+    irr REAL,
+    npv REAL,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tea_evals_maml_id ON tea_evals (maml_id);
+CREATE INDEX IF NOT EXISTS idx_tea_evals_minimal_selling_price ON tea_evals (minimal_selling_price);
+CREATE INDEX IF NOT EXISTS idx_tea_evals_irr ON tea_evals (irr);
+"""
+
+PAPER_TAG_KINDS = {
+    "doe": "tags_doe",
+    "feedstocks": "tags_feedstocks",
+    "target_product": "tags_target_product",
+}
+
+def _sqlite_number(value):
+    """Coerce TEA metrics to a float column value (numpy scalars, NaN/inf from IRR solves -> NULL)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+class SQLitePersistence(Persistence):
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        # one connection shared by batch ingestion's worker threads, every use of it goes through self._lock
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript(SQLITE_SCHEMA)
+
+    def load_paper_graph(self):
+        """Nothing to preload, queries go to the database (kept for parity with JSONPersistence)"""
+        print("[SQLitePersistence.load_paper_graph]")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- papers
+
+    def _retrieve_paper_where(self, column: str, value):
+        with self._lock:
+            row = self._db.execute(f"SELECT data FROM papers WHERE {column} = ? LIMIT 1", (value,)).fetchone()
+        return Paper(**json.loads(row[0])) if row else None
+
+    def retrieve_paper_by_link(self, link: str):
+        """Retrieve a paper by its source link (file path or URL)"""
+        return self._retrieve_paper_where("link", link)
+
+    def retrieve_paper_by_doi(self, doi: str):
+        """Retrieve a paper by DOI, falling back to a normalized DOI match"""
+        return self._retrieve_paper_where("doi", doi) or self._retrieve_paper_where("doi_normalized", normalize_doi(doi))
+
+    def retrieve_paper_by_id(self, paper_id: str):
+        """Retrieve a paper by its id"""
+        return self._retrieve_paper_where("id", paper_id)
+
+    def retrieve_paper_from_store(self, identifier):
+        paper = self.retrieve_paper_by_link(identifier)
+        if paper is not None:
+            print(f"[SQLitePersistence.retrieve_paper_from_store] Paper loaded from cache: {paper.source.link}")
+        return paper
+
+    def _save_paper_data(self, paper_data: dict):
+        paper_id = paper_data.get("id") or paper_data.get("doi")
+        self._db.execute(
+            "INSERT OR REPLACE INTO papers (id, doi, doi_normalized, link, title, describes_process, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                paper_id,
+                paper_data.get("doi"),
+                normalize_doi(paper_data.get("doi")),
+                (paper_data.get("source") or {}).get("link"),
+                paper_data.get("title"),
+                paper_data.get("describes_process"),
+                json.dumps(paper_data),
+            ))
+        self._db.execute("DELETE FROM paper_tags WHERE paper_id = ?", (paper_id,))
+        for kind, field in PAPER_TAG_KINDS.items():
+            tags = set(str(tag).strip().lower() for tag in (paper_data.get(field) or []) if tag)
+            self._db.executemany("INSERT INTO paper_tags (paper_id, kind, tag) VALUES (?, ?, ?)", [(paper_id, kind, tag) for tag in tags])
+
+    def save_paper(self, paper):
+        """Save a paper to the database"""
+        print("[SQLitePersistence.save_paper]")
+        if not paper.doi:
+            raise ValueError("DOI is missing for the paper")
+        with self._lock, self._db:
+            self._save_paper_data(paper.get_paper_data())
+
+    # --- mamls
+
+    def _save_maml_data(self, maml_data: dict):
+        self._db.execute(
+            "INSERT OR REPLACE INTO mamls (id, paper_id, process_feedstock, process_target, data) VALUES (?, ?, ?, ?, ?)",
+            (maml_data.get("id"), maml_data.get("paper_id"), maml_data.get("process_feedstock"), maml_data.get("process_target"), json.dumps(maml_data)))
+
+    def save_maml(self, maml):
+        """Save a MAML to the database"""
+        print("[SQLitePersistence.save_maml]")
+        if not maml.id:
+            raise ValueError("Missing ID for maml")
+        with self._lock, self._db:
+            self._save_maml_data(maml.json())
+
+    def retrieve_maml_data(self, maml_id: str):
+        """Retrieve a MAML's JSON data by id, None if not found"""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM mamls WHERE id = ?", (maml_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # --- tea evals
+
+    def _save_tea_eval_data(self, maml_id: str, tea_eval_data: dict):
+        result = tea_eval_data.get("result") or {}
+        self._db.execute(
+            "INSERT INTO tea_evals (maml_id, level, production_costs, minimal_selling_price, irr, npv, created_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                maml_id,
+                tea_eval_data.get("level"),
+                _sqlite_number(result.get("production_costs")),
+                _sqlite_number(result.get("minimal_selling_price")),
+                _sqlite_number(result.get("irr")),
+                _sqlite_number(result.get("npv")),
+                tea_eval_data.get("created_at"),
+                json.dumps(tea_eval_data, default=str),
+            ))
+
+    def save_tea_evals(self, maml_id: str, tea_evals_data: List[dict], clear_prior: bool = False):
+        """Save TEA evals (as JSON data) for a MAML, optionally replacing earlier evals"""
+        print("[SQLitePersistence.save_tea_evals]")
+        with self._lock, self._db:
+            if clear_prior:
+                self._db.execute("DELETE FROM tea_evals WHERE maml_id = ?", (maml_id,))
+            for tea_eval_data in tea_evals_data:
+                self._save_tea_eval_data(maml_id, tea_eval_data)
+
+    def retrieve_tea_evals_data(self, maml_id: str) -> List[dict]:
+        """Retrieve TEA evals JSON data for a MAML, oldest first"""
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM tea_evals WHERE maml_id = ? ORDER BY id", (maml_id,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    # --- queries
+
+    def query_papers(self, describes_process: str = None, tags_doe: List[str] = None, tags_feedstocks: List[str] = None, tags_target_product: List[str] = None,
+                     min_irr: float = None, max_minimal_selling_price: float = None, tea_level: int = None) -> Iterator[Paper]:
+        """Stream papers matching all given filters. Tag filters match any of the given tags for that kind.
+            TEA filters match papers with at least one eval (at the given level, if any) within the given bounds.
+            Ex) all switchgrass -> ethanol papers with IRR > 10%: query_papers(tags_feedstocks=["switchgrass"], tags_target_product=["ethanol"], min_irr=0.1)
+        """
+        clauses = []
+        args = []
+        if describes_process != None:
+            clauses.append("p.describes_process = ?")
+            args.append(describes_process)
+        for kind, tags in (("doe", tags_doe), ("feedstocks", tags_feedstocks), ("target_product", tags_target_product)):
+            if tags:
+                clauses.append(f"p.id IN (SELECT paper_id FROM paper_tags WHERE kind = ? AND tag IN ({', '.join('?' * len(tags))}))")
+                args.extend([kind, *[tag.strip().lower() for tag in tags]])
+        tea_clauses = []
+        if min_irr != None:
+            tea_clauses.append("t.irr > ?")
+            args.append(min_irr)
+        if max_minimal_selling_price != None:
+            tea_clauses.append("t.minimal_selling_price <= ?")
+            args.append(max_minimal_selling_price)
+        if tea_level != None:
+            tea_clauses.append("t.level = ?")
+            args.append(tea_level)
+        if tea_clauses:
+            clauses.append(f"p.id IN (SELECT m.paper_id FROM tea_evals t JOIN mamls m ON m.id = t.maml_id WHERE {' AND '.join(tea_clauses)})")
+        sql = "SELECT p.data FROM papers p"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        # page through the cursor rather than fetchall() so memory stays bounded on large libraries (lock released between pages)
+        with self._lock:
+            cursor = self._db.execute(sql, args)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(100)
+            if not rows:
+                break
+            for row in rows:
+                yield Paper(**json.loads(row[0]))
+
+    # --- import
+
+    def import_json_caches(self, papers_path: str = None, mamls_path: str = None, teas_path: str = None):
+        """One-shot import from the JSON graph caches (ex: ./data/caches/papers.json, mamls.json, teas.json)"""
+        print("[SQLitePersistence.import_json_caches]")
+        counts = dict(papers=0, mamls=0, tea_evals=0)
+        with self._lock, self._db:
+            if papers_path and os.path.exists(papers_path):
+                for paper_data in RecordLog(papers_path).load().values():
+                    self._save_paper_data(paper_data)
+                    counts["papers"] += 1
+            if mamls_path and os.path.exists(mamls_path):
+                for maml_data in RecordLog(mamls_path).load().values():
+                    self._save_maml_data(maml_data)
+                    counts["mamls"] += 1
+            if teas_path and os.path.exists(teas_path):
+                for maml_id, tea_evals_data in RecordLog(teas_path).load().items():
+                    self._db.execute("DELETE FROM tea_evals WHERE maml_id = ?", (maml_id,))
+                    for tea_eval_data in tea_evals_data:
+                        self._save_tea_eval_data(maml_id, tea_eval_data)
+                        counts["tea_evals"] += 1
+        print(f"[SQLitePersistence.import_json_caches] imported: {counts}")
+        return counts
 
 
 # ####################################
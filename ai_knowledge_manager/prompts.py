@@ -1,10 +1,12 @@
 import json
 from .clients import get_llm_client, get_llm_model
+from .llm_trace import traced_prompt
 
 
 # ##########################################
 # PROMPTS: PAPERs
 
+@traced_prompt
 def prompt_figure_description(figure_title_caption_text: str, figure_image_url: str) -> str:
     print("[prompt_figure_description]")
     client = get_llm_client()
@@ -25,6 +27,7 @@ def prompt_figure_description(figure_title_caption_text: str, figure_image_url:
 # This function is only used twice inside the specific case of loading a file from text, so can be refactored later
 #self.title = prompt_detail_extraction(text[0:500], "What is the title of this paper?")
 #self.doi = prompt_detail_extraction(text, "What is the DOI for this paper? (Ex: https://doi.org/10.1038/srep20361, https://doi.org/10.4161/bioe.19874)")
+@traced_prompt
 def prompt_detail_extraction(paper_text: str, question: str) -> str:
     print("[prompt_detail_extraction]")
     client = get_llm_client()
@@ -48,6 +51,7 @@ def prompt_detail_extraction(paper_text: str, question: str) -> str:
     response_json = json.loads(response_text)
     return response_json["answer"]
 
+@traced_prompt
 def prompt_paper_meta(paper_text: str) -> str:
     print("[prompt_paper_meta_abstract]")
     client = get_llm_client()
@@ -85,6 +89,7 @@ def prompt_paper_meta(paper_text: str) -> str:
     response_json = json.loads(response_text)
     return response_json
 
+@traced_prompt
 def prompt_assess_paper_type(paper_text: str) -> str:
     """
     Prompt the AI to assess if the paper is a single process or a review.
@@ -294,6 +299,7 @@ doe_tags_list = """
 - γ_butyrolactone
 """
 
+@traced_prompt
 def prompt_tags_from_paper(paper_text: str) -> str:
     print("[prompt_describe_process_flows]")
     client = get_llm_client()
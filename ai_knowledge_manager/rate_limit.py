@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+
+
+# ##########################################
+# RATE LIMITING
+# Token bucket per LLM provider, shared by every thread in the process so concurrent pipelines stay under API limits.
+# Configured via LLM_RATE_LIMIT_RPM_<PROVIDER> (ex: LLM_RATE_LIMIT_RPM_OPENAI=500) or LLM_RATE_LIMIT_RPM for all.
+
+class RateLimiter():
+    def __init__(self, requests_per_minute: float = None):
+        self.requests_per_minute = requests_per_minute
+        self._tokens = float(requests_per_minute or 0)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request is allowed (no-op when unlimited)"""
+        if not self.requests_per_minute:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                rate_per_second = self.requests_per_minute / 60
+                self._tokens = min(self.requests_per_minute, self._tokens + (now - self._updated_at) * rate_per_second)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / rate_per_second
+            time.sleep(wait_seconds)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_llm_rate_limiter(provider: str) -> RateLimiter:
+    """Process-wide rate limiter for a provider"""
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            rpm = os.environ.get(f"LLM_RATE_LIMIT_RPM_{provider.upper()}", os.environ.get("LLM_RATE_LIMIT_RPM"))
+            _rate_limiters[provider] = RateLimiter(float(rpm) if rpm else None)
+        return _rate_limiters[provider]
+
+def set_llm_rate_limit(provider: str, requests_per_minute: float = None):
+    """Override a provider's rate limit (None for unlimited)"""
+    with _rate_limiters_lock:
+        _rate_limiters[provider] = RateLimiter(requests_per_minute)
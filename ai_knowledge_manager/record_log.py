@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+
+
+# ##########################################
+# APPEND-ONLY RECORD LOG
+# The graph caches (papers/mamls/teas) keep their existing JSON file as a compacted snapshot, while writes go to an
+# append-only JSONL sidecar ("<cache_path>.log") with one record per write. Loading replays the log over the
+# snapshot. Compaction rewrites the snapshot to a temp file and atomically renames it into place, then resets the log.
+
+class RecordLog():
+    def __init__(self, path: str, compact_ratio: float = 1.0, compact_min_bytes: int = 1024 * 1024):
+        self.path = path
+        self.log_path = path + ".log"
+        # compact once the log outgrows the snapshot, so rewrite costs stay amortized to the size of what's written
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self.data = {}
+        self._log_records = 0
+        self._log_bytes = 0
+        self._snapshot_bytes = 0
+        self._lock = threading.RLock() # agents can share a store across worker threads
+
+    def load(self) -> dict:
+        """Load the snapshot and replay any logged records on top of it"""
+        # --- snapshot (create if none exists)
+        if os.path.exists(self.path) == False:
+            print(f"[RecordLog.load] No snapshot found, creating one: {self.path}")
+            self._write_snapshot({})
+        with open(self.path, 'r') as file:
+            self.data = json.load(file)
+        self._snapshot_bytes = os.path.getsize(self.path)
+        # --- log replay
+        self._log_records = 0
+        self._log_bytes = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a torn trailing write from a crash, everything before it is intact
+                        print(f"[RecordLog.load] Skipping unreadable record in {self.log_path}")
+                        continue
+                    self._apply(record)
+                    self._log_records += 1
+            self._log_bytes = os.path.getsize(self.log_path)
+        return self.data
+
+    def put(self, key: str, value):
+        """Set a key to a value"""
+        self._write_record({ "op": "put", "key": key, "value": value })
+
+    def append(self, key: str, value):
+        """Append a value onto the list stored at a key"""
+        self._write_record({ "op": "append", "key": key, "value": value })
+
+    def compact(self):
+        """Rewrite the snapshot with current data and reset the log"""
+        print(f"[RecordLog.compact] {self.path} ({self._log_records} records)")
+        with self._lock:
+            self._write_snapshot(self.data)
+            self._snapshot_bytes = os.path.getsize(self.path)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self._log_records = 0
+            self._log_bytes = 0
+
+    def _apply(self, record: dict):
+        if record.get("op") == "append":
+            if self.data.get(record["key"]) == None:
+                self.data[record["key"]] = []
+            self.data[record["key"]].append(record["value"])
+        else:
+            self.data[record["key"]] = record["value"]
+
+    def _write_record(self, record: dict):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._apply(record)
+            with open(self.log_path, 'a') as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+            self._log_records += 1
+            self._log_bytes += len(line)
+            if self._log_bytes > max(self._snapshot_bytes * self.compact_ratio, self.compact_min_bytes):
+                self.compact()
+
+    def _write_snapshot(self, data: dict):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,109 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List, Tuple
+
+
+# ##########################################
+# CHUNKING + RETRIEVAL
+# Texts are split into overlapping sentence-window chunks (stored as (start, end) character spans so a paper only
+# keeps offsets, not copies of its text) and ranked against a query with BM25, all local and dependency-free.
+
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+TERM_RE = re.compile(r"[a-z0-9]+")
+
+def chunk_spans(text: str, sentences_per_chunk: int = 5, stride: int = 3, max_chunk_chars: int = 2000) -> List[Tuple[int, int]]:
+    """Sentence-window chunks as (start, end) spans into text. Windows of `sentences_per_chunk` sentences advance by `stride`."""
+    # --- sentence spans (long runs w/o punctuation, ex: PDF tables, are cut at max_chunk_chars)
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY_RE.finditer(text):
+        sentences.append((start, match.start()))
+        start = match.end()
+    sentences.append((start, len(text)))
+    sentences = [(s, e) for s, e in sentences if text[s:e].strip()]
+    split_sentences = []
+    for s, e in sentences:
+        while e - s > max_chunk_chars:
+            split_sentences.append((s, s + max_chunk_chars))
+            s += max_chunk_chars
+        split_sentences.append((s, e))
+    # --- windows
+    spans = []
+    for i in range(0, max(len(split_sentences) - sentences_per_chunk + stride, 1), stride):
+        window = split_sentences[i:i + sentences_per_chunk]
+        if not window:
+            break
+        # keep windows from growing past the char cap when sentences are long
+        end = window[0][1]
+        for _, e in window[1:]:
+            if e - window[0][0] > max_chunk_chars:
+                break
+            end = e
+        spans.append((window[0][0], end))
+    return spans
+
+def tokenize(text: str) -> List[str]:
+    return [term for term in TERM_RE.findall(text.lower().replace("_", " ")) if len(term) > 1]
+
+
+class BM25Index():
+    def __init__(self, docs: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_term_counts = [Counter(tokenize(doc)) for doc in docs]
+        self.doc_lengths = [sum(counts.values()) for counts in self.doc_term_counts]
+        self.avg_doc_length = (sum(self.doc_lengths) / len(docs)) if docs else 0
+        doc_freqs = Counter()
+        for counts in self.doc_term_counts:
+            doc_freqs.update(counts.keys())
+        self.idf = { term: math.log(1 + (len(docs) - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items() }
+
+    def search(self, query: str, k: int = None) -> List[Tuple[int, float]]:
+        """Return (doc index, score) for docs matching the query, best first"""
+        query_terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for i, counts in enumerate(self.doc_term_counts):
+            score = 0.0
+            length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / (self.avg_doc_length or 1))
+            for term in query_terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + length_norm)
+            if score > 0:
+                scores.append((i, score))
+        scores.sort(key=lambda s: -s[1])
+        return scores[0:k] if k else scores
+
+
+@lru_cache(maxsize=32)
+def _text_index(text: str, spans: Tuple[Tuple[int, int], ...] = None) -> Tuple[Tuple[Tuple[int, int], ...], BM25Index]:
+    # cached since the same text is queried once per prompt/step
+    spans = spans or tuple(chunk_spans(text))
+    return spans, BM25Index([text[s:e] for s, e in spans])
+
+def retrieve_text(text: str, query: str, max_tokens: int, count_tokens, spans: List[Tuple[int, int]] = None) -> str:
+    """Top BM25 chunks for the query that fit within max_tokens, merged and returned in document order.
+        The opening chunk (title/abstract) is always included.
+    """
+    spans, index = _text_index(text, tuple(map(tuple, spans)) if spans else None)
+    if not spans:
+        return ""
+    ranked = [0] + [i for i, _ in index.search(query) if i != 0]
+    chosen = []
+    tokens_out = 0
+    for i in ranked:
+        chunk_tokens = count_tokens(text[spans[i][0]:spans[i][1]])
+        if tokens_out + chunk_tokens > max_tokens:
+            continue
+        chosen.append(spans[i])
+        tokens_out += chunk_tokens
+    # merge overlapping windows so shared sentences aren't repeated
+    merged = []
+    for s, e in sorted(chosen):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return "\n...\n".join(text[s:e].strip() for s, e in merged)
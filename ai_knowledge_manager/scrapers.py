@@ -1,27 +1,168 @@
 import asyncio
-from typing import Optional
-import nest_asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+from typing import List, Optional
 from pyppeteer import launch
 
-# Apply nest_asyncio to enable running asyncio in a synchronous context
-nest_asyncio.apply()
+
+# ##########################################
+# BROWSER POOL
+# Warm Chromium processes with a fixed set of pages that get reused across scrapes. Pages are recycled after
+# `max_uses_per_page` loads or any error (a slot whose recycle failed keeps its place, and gets a new page on its next
+# use, so the pool never shrinks). The pool lives on its own event loop thread (pyppeteer connections are
+# bound to the loop that launched them), so sync callers on any thread and async callers on any loop can share it.
+
+class BrowserPool():
+    def __init__(self, num_browsers: int = 1, pages_per_browser: int = 4, page_timeout_ms: int = 30000, max_uses_per_page: int = 25):
+        self.num_browsers = num_browsers
+        self.pages_per_browser = pages_per_browser
+        self.page_timeout_ms = page_timeout_ms
+        self.max_uses_per_page = max_uses_per_page
+        self._browsers = []
+        self._slots = None # asyncio.Queue of dict(browser_idx, page, uses)
+        self._start_lock = None
+
+    async def start(self):
+        if self._slots is not None:
+            return
+        self._start_lock = self._start_lock or asyncio.Lock()
+        async with self._start_lock:
+            if self._slots is not None:
+                return
+            print(f"[BrowserPool.start] {self.num_browsers} browsers x {self.pages_per_browser} pages")
+            slots = asyncio.Queue()
+            for browser_idx in range(self.num_browsers):
+                self._browsers.append(await self._launch())
+                for _ in range(self.pages_per_browser):
+                    slots.put_nowait(dict(browser_idx=browser_idx, page=await self._browsers[browser_idx].newPage(), uses=0))
+            self._slots = slots
+
+    async def _launch(self):
+        # signal handlers can only be installed from the main thread, and the pool runs on its own thread
+        return await launch(handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False)
+
+    async def _recycle(self, slot: dict) -> dict:
+        """Swap a slot's page for a fresh one, relaunching its browser if it died"""
+        try:
+            await slot["page"].close()
+        except Exception:
+            pass
+        try:
+            page = await self._browsers[slot["browser_idx"]].newPage()
+        except Exception:
+            print(f"[BrowserPool._recycle] relaunching browser {slot['browser_idx']}")
+            self._browsers[slot["browser_idx"]] = await self._launch()
+            page = await self._browsers[slot["browser_idx"]].newPage()
+        return dict(browser_idx=slot["browser_idx"], page=page, uses=0)
+
+    async def _acquire(self) -> dict:
+        slot = await self._slots.get()
+        if slot["page"] == None: # recycling failed after its last use
+            try:
+                slot = await self._recycle(slot)
+            except BaseException:
+                self._slots.put_nowait(slot)
+                raise
+        return slot
+
+    async def scrape(self, url: str, await_selector: Optional[str] = None) -> str:
+        await self.start()
+        slot = await self._acquire()
+        failed = False
+        try:
+            # Navigate to the URL
+            await slot["page"].goto(url, timeout=self.page_timeout_ms)
+            # Wait for a specific element to load (optional, modify as needed)
+            if await_selector != None:
+                await slot["page"].waitForSelector(await_selector, timeout=self.page_timeout_ms)
+            # Get the page content
+            return await slot["page"].content()
+        except BaseException: # incl. cancellation (ex: scrape_sync timing out), which can leave the page mid-load
+            failed = True
+            raise
+        finally:
+            slot["uses"] += 1
+            if failed or slot["uses"] >= self.max_uses_per_page:
+                recycled = dict(browser_idx=slot["browser_idx"], page=None, uses=0)
+                try:
+                    recycled = await self._recycle(slot)
+                except Exception as err:
+                    print(f"[BrowserPool.scrape] recycle failed, retrying on next use: {err}")
+                finally:
+                    self._slots.put_nowait(recycled)
+            else:
+                self._slots.put_nowait(slot)
+
+    async def close(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        self._slots = None
+
+
+_pool = None
+_pool_loop = None
+_pool_lock = threading.Lock()
+
+def configure_browser_pool(**kwargs):
+    """Set pool options (num_browsers, pages_per_browser, page_timeout_ms, max_uses_per_page) before first scrape"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool._slots is not None:
+            raise RuntimeError("Browser pool already started")
+        _pool = BrowserPool(**kwargs)
+
+def _get_pool():
+    """Pool + the event loop thread it runs on, started lazily. Defaults come from SCRAPER_* env vars"""
+    global _pool, _pool_loop
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                num_browsers=int(os.environ.get("SCRAPER_NUM_BROWSERS", 1)),
+                pages_per_browser=int(os.environ.get("SCRAPER_PAGES_PER_BROWSER", 4)),
+                page_timeout_ms=int(os.environ.get("SCRAPER_PAGE_TIMEOUT_MS", 30000)))
+        if _pool_loop is None:
+            _pool_loop = asyncio.new_event_loop()
+            threading.Thread(target=_pool_loop.run_forever, name="browser-pool", daemon=True).start()
+        return _pool, _pool_loop
+
+@atexit.register
+def _close_pool():
+    if _pool is not None and _pool_loop is not None and _pool_loop.is_running():
+        asyncio.run_coroutine_threadsafe(_pool.close(), _pool_loop).result(timeout=10)
+
+
+# ##########################################
+# SCRAPING
 
 async def scrape_async(url: str, await_selector: Optional[str] = None) -> str:
-    # Launch the browser
-    browser = await launch()
-    page = await browser.newPage()
-    # Navigate to the URL
-    await page.goto(url)
-    # Wait for a specific element to load (optional, modify as needed)
-    if await_selector != None:
-      await page.waitForSelector(await_selector)
-    # Get the page content
-    content = await page.content()
-    # Close the browser
-    await browser.close()
-    return content
-
-def scrape_sync(url: str, await_selector: Optional[str] = None) -> str:
-    # Use asyncio's run method to run the async function synchronously
-    return asyncio.get_event_loop().run_until_complete(scrape_async(url, await_selector))
+    pool, loop = _get_pool()
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(pool.scrape(url, await_selector), loop))
+
+async def scrape_many(urls: List[str], await_selector: Optional[str] = None) -> List[Optional[str]]:
+    """Scrape URLs concurrently across the pool's pages. Returns content in URL order, None for failures"""
+    print(f"[scrape_many] {len(urls)} urls")
+    async def scrape_one(url: str):
+        try:
+            return await scrape_async(url, await_selector)
+        except Exception as err:
+            print(f"[scrape_many] failed: {url}, {err}")
+            return None
+    return await asyncio.gather(*[scrape_one(url) for url in urls])
 
+def scrape_sync(url: str, await_selector: Optional[str] = None, timeout_s: float = None) -> str:
+    # Block only the calling thread while the pool's loop does the work (safe from any thread)
+    pool, loop = _get_pool()
+    # covers waiting for a free page + navigation + selector wait. Defaults to SCRAPER_TIMEOUT_S or 4x the page timeout
+    timeout_s = timeout_s or float(os.environ.get("SCRAPER_TIMEOUT_S", 0)) or 4 * pool.page_timeout_ms / 1000
+    future = asyncio.run_coroutine_threadsafe(pool.scrape(url, await_selector), loop)
+    try:
+        return future.result(timeout=timeout_s)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Scrape timed out after {timeout_s} seconds: {url}")
@@ -0,0 +1,122 @@
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+# ##########################################
+# TIMING SPANS
+# Nested, named spans around pipeline stages (paper load/parse/process, MAML generation, TEA levels, persistence
+# writes, LLM calls) recording wall time, CPU time of the thread that ran it, and attributes (ex: paper link, step
+# type). The parent span is tracked in a ContextVar, so spans opened in run_parallel/asyncio.to_thread workers nest
+# under the span that dispatched them. Export as Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev,
+# speedscope) for a flamegraph-style per-paper breakdown, or print per-name totals.
+# Ex) with span("paper.parse", link=link): ...
+
+_current_span = contextvars.ContextVar("span", default=None)
+
+
+class Span():
+    def __init__(self, span_id: int, name: str, parent, attrs: dict):
+        self.id = span_id
+        self.name = name
+        self.parent_id = parent.id if parent != None else None
+        self.root_attrs = { **(parent.root_attrs if parent != None else {}), **attrs } # attrs inherited down the tree
+        self.attrs = attrs
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.start_s = time.perf_counter()
+        self.wall_s = None
+        self.cpu_s = None
+        self.error = None
+
+
+class SpanTracer():
+    def __init__(self, max_spans: int = 100000):
+        self.enabled = os.environ.get("SPANS_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.spans = deque(maxlen=max_spans) # finished spans, oldest dropped first on long runs
+        self._ids = itertools.count(1)
+        self._origin_s = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            yield None
+            return
+        current = Span(next(self._ids), name, _current_span.get(), attrs)
+        token = _current_span.set(current)
+        cpu_start_s = time.thread_time()
+        try:
+            yield current
+        except BaseException as err:
+            current.error = f"{type(err).__name__}: {err}"
+            raise
+        finally:
+            current.wall_s = time.perf_counter() - current.start_s
+            current.cpu_s = time.thread_time() - cpu_start_s
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(current)
+
+    def summary(self, **where) -> dict:
+        """Totals per span name, slowest first. Filter to one paper/MAML with attrs set on an ancestor span
+            Ex) span_tracer.summary(link="./data/papers/tea_ethanol_switchgrass.txt")
+        """
+        with self._lock:
+            spans = [s for s in self.spans if all(s.root_attrs.get(key) == value for key, value in where.items())]
+        totals = {}
+        for s in spans:
+            total = totals.setdefault(s.name, dict(count=0, errors=0, wall_s=0.0, cpu_s=0.0, max_wall_s=0.0))
+            total["count"] += 1
+            total["errors"] += int(s.error != None)
+            total["wall_s"] += s.wall_s
+            total["cpu_s"] += s.cpu_s
+            total["max_wall_s"] = max(total["max_wall_s"], s.wall_s)
+        for total in totals.values():
+            for key in ("wall_s", "cpu_s", "max_wall_s"):
+                total[key] = round(total[key], 4)
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["wall_s"]))
+
+    def print_summary(self, **where):
+        for name, total in self.summary(**where).items():
+            print(f"[SpanTracer] {name} | count={total['count']} (errors={total['errors']}) | wall={total['wall_s']}s "
+                  f"(max {total['max_wall_s']}s) | cpu={total['cpu_s']}s")
+
+    def chrome_trace(self) -> dict:
+        """Spans as Chrome trace-event JSON ("complete" events, microseconds since the tracer started)"""
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = []
+        for thread_id, thread_name in dict((s.thread_id, s.thread_name) for s in spans).items():
+            events.append(dict(name="thread_name", ph="M", pid=pid, tid=thread_id, args=dict(name=thread_name)))
+        for s in spans:
+            args = { **{ key: str(value) for key, value in s.attrs.items() }, "span_id": s.id, "parent_id": s.parent_id, "cpu_ms": round(s.cpu_s * 1000, 3) }
+            if s.error != None:
+                args["error"] = s.error
+            events.append(dict(name=s.name, cat=s.name.split(".")[0], ph="X", pid=pid, tid=s.thread_id,
+                               ts=round((s.start_s - self._origin_s) * 1e6, 1), dur=round(s.wall_s * 1e6, 1), args=args))
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def export_chrome_trace(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+        print(f"[SpanTracer.export_chrome_trace] {len(self.spans)} spans -> {path}")
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+span_tracer = SpanTracer()
+
+def span(name: str, **attrs):
+    """Shorthand for span_tracer.span"""
+    return span_tracer.span(name, **attrs)
@@ -1,7 +1,10 @@
-import json
-import os
 import uuid
+from ai_knowledge_manager.context import ContextBudgetReport, build_json_context, build_text_context
+from ai_knowledge_manager.llm_trace import llm_run
 from ai_knowledge_manager.paper import Paper
+from ai_knowledge_manager.parallel import run_parallel
+from ai_knowledge_manager.record_log import RecordLog
+from ai_knowledge_manager.spans import span
 from .maml import MAML, MAMLProcessFlowStep, ferementation_methods, INPUT_FEEDSTOCKS, OUPTUT_TARGETS, PROCESS_FLOW_DICTS, get_process_flow_subtypes_by_type
 from .prompts import prompt_maml_choice, prompt_process_flow_list_types, prompt_process_novelty_parameters, prompt_process_step_output, prompt_simple_response
 
@@ -10,22 +13,19 @@ from .prompts import prompt_maml_choice, prompt_process_flow_list_types, prompt_
 # AGENT: MAML
 
 class MAMLAgent():
-    def __init__(self, cache_path: str, maml: MAML = None):
+    def __init__(self, cache_path: str, maml: MAML = None, concurrency: int = 8, context_max_tokens: int = 3000):
         self._maml_graph_path = cache_path
+        self.concurrency = concurrency # max per-step prompts in flight at once (1 runs them serially)
+        self.context_max_tokens = context_max_tokens # token budget for text/MAML context sent with each per-step prompt
         self._maml_graph = None
+        self._maml_log = RecordLog(cache_path)
         self.maml = maml or MAML()
 
     def load_maml_graph(self):
         """Load maml graph cache for checking if we've parsed it already"""
         print("[MAMLAgent.load_maml_graph]")
-        # Create Graph Cache if None Exists
-        if os.path.exists(self._maml_graph_path) == False:
-            print("[MAMLAgent.load_maml_graph] No MAML graph file found, creating one")
-            with open(self._maml_graph_path, 'w') as file:
-                json.dump({}, file)
-        # Load Graph Cache
-        with open(self._maml_graph_path, 'r') as file:
-            self._maml_graph = json.load(file)
+        # Load Graph Cache (snapshot + append-only log, created if none exists)
+        self._maml_graph = self._maml_log.load()
 
     def save(self):
         """Save maml data to a JSON file in the cache directory"""
@@ -36,10 +36,9 @@ class MAMLAgent():
         # --- append
         print(self.maml.id)
         print(self.maml.json())
-        self._maml_graph[self.maml.id] = self.maml.json()
-        # IO: Update JSON graph file
-        with open(self._maml_graph_path, 'w') as file:
-            json.dump(self._maml_graph, file, indent=4)
+        # IO: Append record to the graph log (updates self._maml_graph in place)
+        with span("persistence.save_maml", maml_id=self.maml.id):
+            self._maml_log.put(self.maml.id, self.maml.json())
 
     def _process_maml(self, text: str):
         self.maml.process_flow = []
@@ -50,16 +49,23 @@ class MAMLAgent():
         # EVAL PROCESS STEPS
         # ...has biosteam simulation mappings
         if self.maml.process_target == "ethanol" and self.maml.process_feedstock in ["sugarcane", "switchgrass"]:
-            pretreatment_types = get_process_flow_subtypes_by_type("pretreatment")
-            pretreatment_type_chosen = prompt_maml_choice(text, "determine the pretreatment method for this cellulosic process", "method", pretreatment_types)
-            pretreatment_description_novelty = prompt_simple_response(text, f"Within one paragraph describe the bio-industrial process {pretreatment_type_chosen}. If there is novelty with this processing step mentioned in the text, briefly describe it. Here is a starting description for inspiration: {PROCESS_FLOW_DICTS.get(pretreatment_type_chosen)}")
-            self.maml.process_flow.append(MAMLProcessFlowStep(type=pretreatment_type_chosen, description=pretreatment_description_novelty))
-            # --- fermentation
-            fermentation_types = get_process_flow_subtypes_by_type("fermentation")
-            fermentation_type_chosen = prompt_maml_choice(text, "determine the fermentation method for this cellulosic process", "method", fermentation_types)
-            fermentation_method_key = prompt_maml_choice(text, f"determine the kind of fermentation for this {fermentation_type_chosen} process will be", "kind", list(ferementation_methods.keys()))
-            fermentation_description_novelty = prompt_simple_response(text, f"Within one paragraph describe the bio-industrial process {fermentation_type_chosen}. If there is novelty with this processing step mentioned in the text, briefly describe it. Here is a starting description for inspiration: {PROCESS_FLOW_DICTS.get(fermentation_type_chosen)}")
-            self.maml.process_flow.append(MAMLProcessFlowStep(type=fermentation_type_chosen, description=fermentation_description_novelty, options=dict(fermentation_method=ferementation_methods.get(fermentation_method_key))))
+            # --- pretreatment (choice -> description) and fermentation (choice -> kind -> description) chains are independent of each other
+            def eval_pretreatment_step():
+                with span("maml.step", step_type="pretreatment"):
+                    pretreatment_types = get_process_flow_subtypes_by_type("pretreatment")
+                    pretreatment_text = build_text_context(text, " ".join(["pretreatment", *pretreatment_types]), self.context_max_tokens, name="maml.pretreatment")
+                    pretreatment_type_chosen = prompt_maml_choice(pretreatment_text, "determine the pretreatment method for this cellulosic process", "method", pretreatment_types)
+                    pretreatment_description_novelty = prompt_simple_response(pretreatment_text, f"Within one paragraph describe the bio-industrial process {pretreatment_type_chosen}. If there is novelty with this processing step mentioned in the text, briefly describe it. Here is a starting description for inspiration: {PROCESS_FLOW_DICTS.get(pretreatment_type_chosen)}")
+                    return MAMLProcessFlowStep(type=pretreatment_type_chosen, description=pretreatment_description_novelty)
+            def eval_fermentation_step():
+                with span("maml.step", step_type="fermentation"):
+                    fermentation_types = get_process_flow_subtypes_by_type("fermentation")
+                    fermentation_text = build_text_context(text, " ".join(["fermentation", *fermentation_types, *ferementation_methods.keys()]), self.context_max_tokens, name="maml.fermentation")
+                    fermentation_type_chosen = prompt_maml_choice(fermentation_text, "determine the fermentation method for this cellulosic process", "method", fermentation_types)
+                    fermentation_method_key = prompt_maml_choice(fermentation_text, f"determine the kind of fermentation for this {fermentation_type_chosen} process will be", "kind", list(ferementation_methods.keys()))
+                    fermentation_description_novelty = prompt_simple_response(fermentation_text, f"Within one paragraph describe the bio-industrial process {fermentation_type_chosen}. If there is novelty with this processing step mentioned in the text, briefly describe it. Here is a starting description for inspiration: {PROCESS_FLOW_DICTS.get(fermentation_type_chosen)}")
+                    return MAMLProcessFlowStep(type=fermentation_type_chosen, description=fermentation_description_novelty, options=dict(fermentation_method=ferementation_methods.get(fermentation_method_key)))
+            self.maml.process_flow.extend(run_parallel([eval_pretreatment_step, eval_fermentation_step], max_workers=self.concurrency))
             # --- separation
             self.maml.process_flow.append(MAMLProcessFlowStep(type="separation.ethanol_purification"))
             # --- facilities (TODO: this isn't a step. it's probably parameters at a high level)
@@ -71,33 +77,41 @@ class MAMLAgent():
             self.maml.process_target =  self.maml.paper.tags_target_product[0] if len(self.maml.paper.tags_target_product) == 1 else prompt_maml_choice(text[0:1000], "determine a single target product for this industrial process, here are some examples", "output_target", self.maml.paper.tags_target_product)
             # --- determine all processing step type/labels
             process_flow_types = prompt_process_flow_list_types(text, self.maml.process_feedstock, self.maml.process_target)
-            # ... for each process step type/label
-            for process_flow_type in process_flow_types:
-                # --- skip utilities, waste treatment, and transportation if the prompt included despite being told not to
-                if process_flow_type.startswith("utilities.") or process_flow_type.startswith("waste") or process_flow_type.startswith("transportation."):
-                    continue
-                # --- describe novelty if exists for each step
-                description_novelty = prompt_simple_response(text, f"Within one paragraph describe the bio-industrial process {process_flow_type}. If there is novelty with this processing step mentioned in the text, briefly describe it.")
-                # --- append
+            # --- skip utilities, waste treatment, and transportation if the prompt included despite being told not to
+            process_flow_types = [t for t in process_flow_types if not (t.startswith("utilities.") or t.startswith("waste") or t.startswith("transportation."))]
+            # --- describe novelty if exists for each step (all steps at once, each w/ only the text relevant to that step)
+            def describe_step(process_flow_type: str):
+                with span("maml.step", step_type=process_flow_type):
+                    return prompt_simple_response(build_text_context(text, process_flow_type, self.context_max_tokens, name="maml.step_description"), f"Within one paragraph describe the bio-industrial process {process_flow_type}. If there is novelty with this processing step mentioned in the text, briefly describe it.")
+            descriptions_novelty = run_parallel([lambda process_flow_type=process_flow_type: describe_step(process_flow_type) for process_flow_type in process_flow_types], max_workers=self.concurrency)
+            # --- append
+            for process_flow_type, description_novelty in zip(process_flow_types, descriptions_novelty):
                 self.maml.process_flow.append(MAMLProcessFlowStep(type=process_flow_type, description=description_novelty))
 
         # EVAL PROCESS STEP EXTRAS
-        # --- outputs for stitching together inputs/outputs for TEA        
+        # ...per step prompts only depend on the flow list, so dispatch them all at once (capped by self.concurrency)
+        # ...steps get the MAML as compact JSON (no paper body) rather than the whole object
+        maml_context = build_json_context(self.maml.json(), self.context_max_tokens, name="maml.step_context")
+        # --- outputs for stitching together inputs/outputs for TEA
+        step_output_fns = []
         for i, ps in enumerate(self.maml.process_flow):
             if i == len(self.maml.process_flow) - 1:
                 next_ps = self.maml.process_target
             else:
                 next_ps = self.maml.process_flow[i+1]
-            ps_output_content_context = self.maml # text
-            ps_output = prompt_process_step_output(ps_output_content_context, ps, next_ps)
-            # update the process step on MAML
-            ps.output = ps_output
+            ps_output_content_context = maml_context
+            step_output_fns.append(lambda ps=ps, next_ps=next_ps, content=ps_output_content_context: prompt_process_step_output(content, ps, next_ps))
         # --- novel parameters (with default parameters determined by process flow + input/output mapping, let's get tunable params for novelty)
+        step_novelty_fns = []
         for i, ps in enumerate(self.maml.process_flow):
-            ps_novelty_content_context = self.maml
-            ps_novelty_param = prompt_process_novelty_parameters(ps_novelty_content_context, ps)
-            # update the process step on MAML
-            ps.parameters.append(ps_novelty_param)
+            ps_novelty_content_context = maml_context
+            step_novelty_fns.append(lambda ps=ps, content=ps_novelty_content_context: prompt_process_novelty_parameters(content, ps))
+        with span("maml.step_extras", steps=len(self.maml.process_flow)):
+            step_results = run_parallel(step_output_fns + step_novelty_fns, max_workers=self.concurrency)
+        # update the process steps on MAML
+        for i, ps in enumerate(self.maml.process_flow):
+            ps.output = step_results[i]
+            ps.parameters.append(step_results[len(step_output_fns) + i])
 
     def generate_maml(self, paper: Paper = None, text: str = None, force: bool = False) -> MAML:
         """Process a paper for generating mamls and meta data. Handles saving to and loading from cache"""
@@ -107,13 +121,16 @@ class MAMLAgent():
         self.maml = MAML()
         # --- cache
         self.load_maml_graph()
+        # --- context budgets used by this generation only (concurrent generations/paper retrieval record separately)
+        budget_report = ContextBudgetReport()
         # PROCESS: TEXT
         if text != None:
             # --- no cache for free text
             # --- props
             self.maml.id = str(uuid.uuid4())
             self.maml.title = text # TODO: do a summarizer so someone can drop big text objs
-            self._process_maml(text)
+            with budget_report.active(), llm_run("maml", self.maml.id), span("maml.generate", maml_id=self.maml.id):
+                self._process_maml(text)
         # PROCESS: PAPER
         else:
             # --- cache
@@ -128,7 +145,9 @@ class MAMLAgent():
             self.maml.paper = paper
             self.maml.paper_id = paper.doi
             self.maml.title = paper.title # TODO: re-write to be more about the process than some fluffy academic phrasing/experiment
-            self._process_maml(paper.fulltext())
+            with budget_report.active(), llm_run("maml", self.maml.id), span("maml.generate", maml_id=self.maml.id, paper_id=paper.id):
+                self._process_maml(paper.fulltext())
+        budget_report.print()
         # SAVE
         self.save()
         return self.maml
@@ -2,11 +2,13 @@ import json
 from pydash import snake_case
 from typing import List
 from .clients import get_llm_client, get_llm_model
+from ai_knowledge_manager.llm_trace import traced_prompt
 
 
 # ##########################################
 # PROMPTS: MAMLs
 
+@traced_prompt
 def prompt_maml_choice(content: str, prompt: str, key: str, choices: List[str]):
     print(f"[prompt_maml_choice] {prompt}, choices: {choices}")
     client = get_llm_client()
@@ -42,6 +44,7 @@ def prompt_maml_choice(content: str, prompt: str, key: str, choices: List[str]):
     print(f"[prompt_maml_choice] {prompt}: {response_val}")
     return response_val
 
+@traced_prompt
 def prompt_process_step_output(content: str, process_step_analyzed, next_process_step_name):
     print(f"[prompt_process_step_output] {process_step_analyzed.type} -> {next_process_step_name}")
     client = get_llm_client()
@@ -83,6 +86,7 @@ def prompt_process_step_output(content: str, process_step_analyzed, next_process
         unit=response_json.get("output_unit"),
     )
 
+@traced_prompt
 def prompt_process_novelty_parameters(content: str, process_step_analyzed):
     print(f"[prompt_process_novelty_parameters] {process_step_analyzed.type}")
     client = get_llm_client()
@@ -124,6 +128,7 @@ def prompt_process_novelty_parameters(content: str, process_step_analyzed):
         unit=response_json.get("parameter_unit"),
     )
 
+@traced_prompt
 def prompt_simple_response(content: str, prompt: str):
     print(f"[prompt_simple_response] {prompt}")
     client = get_llm_client()
@@ -154,6 +159,7 @@ def prompt_simple_response(content: str, prompt: str):
     print(f"[prompt_simple_response] response: ", response_text)
     return response_text
 
+@traced_prompt
 def prompt_process_novelty_parameters(content: str, process_step_analyzed):
     print(f"[prompt_process_novelty_parameters] {process_step_analyzed.type}")
     client = get_llm_client()
@@ -195,6 +201,7 @@ def prompt_process_novelty_parameters(content: str, process_step_analyzed):
         unit=response_json.get("parameter_unit"),
     )
 
+@traced_prompt
 def prompt_process_flow_list_types(content: str, feedstock: str, output_target: str):
     print(f"[prompt_process_flow_list_types]")
     client = get_llm_client()
@@ -1,11 +1,15 @@
-import json
-import os
 import time
-from typing import List
+from typing import Dict, List, Optional
+from ai_knowledge_manager.llm_trace import llm_run
+from ai_knowledge_manager.parallel import run_parallel
+from ai_knowledge_manager.record_log import RecordLog
+from ai_knowledge_manager.spans import span
 from ai_maml_builder.maml import MAML
+from .tea_simulator_batch import maml_output_dir_path, run_level_7_batch
 from .tea_simulator_level_1 import tea_simulator_level_1
 from .tea_simulator_level_1_csv import tea_simulator_level_1_csv
 from .tea_simulator_level_7 import tea_simulator_level_7
+from .tea_simulator_monte_carlo import monte_carlo_level_1, monte_carlo_level_7
 
 
 # ##########################################
@@ -23,6 +27,7 @@ class TEAEval():
     def json(self):
         """Return data as serializable JSON obj"""
         return {
+            "type": self.type,
             "level": self.level,
             "result": self.result,
             "input_maml": self.input_maml.json(),
@@ -36,37 +41,37 @@ class TEASimulatorAgent():
     def __init__(self, cache_path: str):
         self._tea_graph_path = cache_path
         self._tea_graph = None
+        self._tea_log = RecordLog(cache_path)
         self.evaluations = []
 
     def load_tea_graph(self):
         """Load tea graph cache for checking if we've parsed it already"""
         print("[TEASimulatorAgent.load_tea_graph]")
-        # Create Graph Cache if None Exists
-        if os.path.exists(self._tea_graph_path) == False:
-            print("[TEASimulatorAgent.load_maml_graph] No MAML graph file found, creating one")
-            with open(self._tea_graph_path, 'w') as file:
-                json.dump({}, file)
-        # Load Graph Cache
-        with open(self._tea_graph_path, 'r') as file:
-            self._tea_graph = json.load(file)
+        # Load Graph Cache (snapshot + append-only log, created if none exists)
+        self._tea_graph = self._tea_log.load()
 
-    def save(self, maml: MAML, clear_prior: bool = False):
-        """Save to disk"""
+    def save(self, maml: MAML, clear_prior: bool = False, evaluations: List[TEAEval] = None):
+        """Save to disk (self.evaluations, unless given the evals to save)"""
         print("[TEASimulatorAgent.save]")
         if not maml.id:
             raise ValueError("Missing ID for paper, which the graph keys on currently")
-        # --- either append or clear and make a new list
-        evals_list = list(map(lambda s: s.json(), self.evaluations))
-        if clear_prior:
-            self._tea_graph[maml.id] = evals_list
-        else:
-            # ...ensure it has an arr
-            if self._tea_graph.get(maml.id) == None:
-                self._tea_graph[maml.id] = []
-            self._tea_graph[maml.id].extend(evals_list)
-        # --- save to disk
-        with open(self._tea_graph_path, 'w') as file:
-            json.dump(self._tea_graph, file, indent=4)
+        # --- either append or clear and make a new list (one log record per eval, updates self._tea_graph in place)
+        evals_list = list(map(lambda s: s.json(), self.evaluations if evaluations == None else evaluations))
+        with span("persistence.save_tea", maml_id=maml.id, evals=len(evals_list)):
+            if clear_prior:
+                self._tea_log.put(maml.id, [])
+            for tea_eval in evals_list:
+                self._tea_log.append(maml.id, tea_eval)
+
+    def _run_level_1(self, maml: MAML, input_params: dict, output_dir_path: str) -> Optional[TEAEval]:
+        try:
+            with llm_run("tea", maml.id), span("tea.level_1", maml_id=maml.id):
+                result, exec_history = tea_simulator_level_1(maml, params=input_params)
+            tea_simulator_level_1_csv(maml, output_dir_path) # TODO: append CSV to tea
+            return TEAEval(type="simulation", level=1, input_maml=maml, input_params=input_params, result=result, exec_history=exec_history)
+        except Exception as lvl_1_err:
+            print(lvl_1_err)
+            return None
 
     def run(self, maml: MAML, input_params: dict, levels: List[int], output_dir_path: str, clear_prior: bool = True) -> List[TEAEval]:
         """Run a MaML+Inputs through multiple TEA simulators and store results on self"""
@@ -79,17 +84,14 @@ class TEASimulatorAgent():
         # self.evaluations.append(TEAEval(type="paper_eval", input_params=input_params, result=paper_eval_result))
         # --- LEVEL 1
         if 1 in levels or levels == None:
-            try:
-                result, exec_history = tea_simulator_level_1(maml, params=input_params)
-                tea_simulator_level_1_csv(maml, output_dir_path) # TODO: append CSV to tea
-                tea_eval = TEAEval(type="simulation", level=1, input_maml=maml, input_params=input_params, result=result, exec_history=exec_history)
+            tea_eval = self._run_level_1(maml, input_params, output_dir_path)
+            if tea_eval != None:
                 self.evaluations.append(tea_eval)
-            except Exception as lvl_1_err:
-                print(lvl_1_err)
         # --- LEVEL 7
         if 7 in levels or levels == None:
             try:
-                result = tea_simulator_level_7(maml, params=input_params, output_dir_path=output_dir_path)
+                with llm_run("tea", maml.id), span("tea.level_7", maml_id=maml.id):
+                    result = tea_simulator_level_7(maml, params=input_params, output_dir_path=output_dir_path)
                 tea_eval = TEAEval(type="simulation", level=7, input_maml=maml, input_params=input_params, result=result)
                 self.evaluations.append(tea_eval)
             except Exception as lvl_7_err:
@@ -99,3 +101,60 @@ class TEASimulatorAgent():
         self.save(maml=maml, clear_prior=clear_prior)
         # --- return evals
         return self.evaluations
+
+    def run_batch(self, mamls: List[MAML], input_params: List[dict], levels: List[int], output_dir_path: str, max_workers: int = None,
+                  concurrency: int = 4, clear_prior: bool = True) -> Dict[str, List[TEAEval]]:
+        """Run many MAMLs (w/ their params, same order) through the simulators and save each one's evals. Level 1 (LLM
+            bound) runs on threads, level 7 on a process pool w/ a BioSTEAM flowsheet per worker (tea_simulator_batch.py)"""
+        print(f"[TEASimulatorAgent.run_batch] {len(mamls)} MAMLs, levels={levels}")
+        self.load_tea_graph()
+        evaluations = { i: [] for i in range(len(mamls)) }
+        # --- LEVEL 1
+        if 1 in levels or levels == None:
+            # one output dir per MAML, so the CSVs don't overwrite each other
+            level_1_evals = run_parallel([
+                lambda maml=maml, params=params: self._run_level_1(maml, params, maml_output_dir_path(output_dir_path, maml))
+                for maml, params in zip(mamls, input_params)
+            ], max_workers=concurrency)
+            for i, tea_eval in enumerate(level_1_evals):
+                if tea_eval != None:
+                    evaluations[i].append(tea_eval)
+        # --- LEVEL 7
+        if 7 in levels or levels == None:
+            with span("tea.level_7_batch", num_mamls=len(mamls)):
+                level_7_results = run_level_7_batch(list(zip(mamls, input_params)), output_dir_path=output_dir_path, max_workers=max_workers)
+            for i, run in enumerate(level_7_results):
+                if run["result"] != None:
+                    evaluations[i].append(TEAEval(type="simulation", level=7, input_maml=mamls[i], input_params=input_params[i], result=run["result"]))
+        # SAVE
+        for i, maml in enumerate(mamls):
+            self.evaluations = evaluations[i]
+            self.save(maml=maml, clear_prior=clear_prior)
+        self.evaluations = []
+        return { maml.id: evaluations[i] for i, maml in enumerate(mamls) }
+
+    def run_monte_carlo(self, maml: MAML, input_params: dict, levels: List[int], num_samples: int = 1000, seed: int = None, max_workers: int = None, clear_prior: bool = False) -> List[TEAEval]:
+        """Uncertainty analysis over params carrying distributions (see add_param_distributions): percentile bands and
+            sensitivities per level, stored in the TEA graph as "monte_carlo" evals"""
+        print(f"[TEASimulatorAgent.run_monte_carlo] {num_samples} samples, levels={levels}")
+        self.load_tea_graph()
+        # kept apart from self.evaluations, so prior runs' evals aren't appended to the graph again on save
+        mc_evaluations = []
+        # --- LEVEL 1 (vectorized over all samples)
+        if 1 in levels or levels == None:
+            try:
+                with llm_run("tea", maml.id), span("tea.monte_carlo.level_1", maml_id=maml.id, num_samples=num_samples):
+                    result = monte_carlo_level_1(maml, input_params, num_samples=num_samples, seed=seed)
+                mc_evaluations.append(TEAEval(type="monte_carlo", level=1, input_maml=maml, input_params=input_params, result=result))
+            except Exception as lvl_1_err:
+                print(lvl_1_err)
+        # --- LEVEL 7 (one simulation per sample, across a process pool)
+        if 7 in levels or levels == None:
+            try:
+                with span("tea.monte_carlo.level_7", maml_id=maml.id, num_samples=num_samples):
+                    result = monte_carlo_level_7(maml, input_params, num_samples=num_samples, seed=seed, max_workers=max_workers)
+                mc_evaluations.append(TEAEval(type="monte_carlo", level=7, input_maml=maml, input_params=input_params, result=result))
+            except Exception as lvl_7_err:
+                print(lvl_7_err)
+        self.save(maml=maml, clear_prior=clear_prior, evaluations=mc_evaluations)
+        return mc_evaluations
@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 from openai import OpenAI
 import os
 import pydash as _
+from ai_knowledge_manager.llm_cache import wrap_llm_client
 
 # ENV
 load_dotenv()
@@ -18,9 +19,10 @@ deepseek_client = OpenAI(
 )
 
 def get_llm_client():
+    # rate limited per provider, and responses are cached on disk keyed on the request so identical prompts don't hit the network twice
     if LLM_PROVIDER == "deepseek":
-        return deepseek_client
-    return openai_client
+        return wrap_llm_client(deepseek_client, "deepseek")
+    return wrap_llm_client(openai_client, "openai")
 
 def get_llm_model(model=None):
     if LLM_PROVIDER == "deepseek":
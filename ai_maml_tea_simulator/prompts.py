@@ -1,8 +1,10 @@
 import json
 from ai_maml_builder.maml import MAML
 from .clients import get_llm_client, get_llm_model
+from ai_knowledge_manager.llm_trace import traced_prompt
 
 
+@traced_prompt
 def generate_simulator_parameters(maml: MAML, params_template: dict):
     print(f"[generate_simulator_parameters] filling ", params_template)
     client = get_llm_client()
@@ -0,0 +1,96 @@
+import hashlib
+import importlib.util
+import json
+import marshal
+import math
+import threading
+from typing import Callable, List, Tuple
+import numpy as np
+import numpy_financial as npf
+from ai_knowledge_manager.artifacts import get_artifact_store
+
+
+# ##########################################
+# GENERATED STEP FUNCTION CACHE
+# LLM-written level 1 step functions are stored in the artifact store keyed on (fn name, step type, parameter schema,
+# prompt version), with their source and compiled code object (marshal, keyed on the interpreter's bytecode magic so
+# a Python upgrade recompiles). Repeat simulations/parameter sweeps on the same MAML make no LLM calls, and functions
+# already loaded this process skip compilation entirely.
+
+PYTHON_BYTECODE_TAG = importlib.util.MAGIC_NUMBER.hex()
+
+
+def step_fn_namespace() -> dict:
+    """Globals generated functions run with (the prompt allows the standard library, numpy and numpy_financial)"""
+    return { "__builtins__": __builtins__, "math": math, "np": np, "numpy": np, "npf": npf }
+
+
+class StepFnCache():
+    def __init__(self, store=None):
+        self.store = store or get_artifact_store()
+        self.stats = dict(loaded=0, compiled=0, generated=0)
+        self._fns = {} # key -> (fn, source) loaded this process
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(fn_name: str, step_type: str, parameters: List, prompt_version: str) -> str:
+        schema = dict(fn_name=fn_name, step_type=step_type, parameters=parameters, prompt_version=prompt_version)
+        return hashlib.sha256(json.dumps(schema, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _code(self, key: str, fn_name: str, source: str):
+        """Compiled code for a source, reusing the marshaled code object from a prior run"""
+        code_key = f"step_fn_code:{key}:{PYTHON_BYTECODE_TAG}"
+        entry = self.store.get_record(code_key)
+        if entry != None:
+            content = self.store.get_blob(entry["content_hash"])
+            if content != None:
+                return marshal.loads(content)
+        code = compile(source, f"<step_fn {fn_name}>", "exec")
+        self._count("compiled")
+        self.store.put_record(code_key, dict(content_hash=self.store.put_blob(marshal.dumps(code))))
+        return code
+
+    def _load(self, key: str, fn_name: str, source: str) -> Callable:
+        namespace = step_fn_namespace()
+        exec(self._code(key, fn_name, source), namespace)
+        if not callable(namespace.get(fn_name)):
+            raise ValueError(f"Generated source does not define {fn_name}")
+        return namespace[fn_name]
+
+    def get_or_create(self, fn_name: str, step_type: str, parameters: List, prompt_version: str, generate_fn: Callable[[], str]) -> Tuple[Callable, str]:
+        """(function, source) for a step, calling generate_fn (the LLM) only if no prior run generated it"""
+        key = self.key(fn_name, step_type, parameters, prompt_version)
+        with self._lock:
+            if key in self._fns:
+                self.stats["loaded"] += 1
+                return self._fns[key]
+        entry = self.store.get_record(f"step_fn:{key}")
+        source = self.store.get_blob(entry["source_hash"]).decode("utf-8") if entry != None else None
+        if source != None:
+            fn = self._load(key, fn_name, source)
+            self._count("loaded")
+        else:
+            source = generate_fn()
+            fn = self._load(key, fn_name, source) # only functions that compile and define fn_name are kept
+            self._count("generated")
+            self.store.put_record(f"step_fn:{key}", dict(fn_name=fn_name, step_type=step_type, prompt_version=prompt_version,
+                                                         source_hash=self.store.put_blob(source.encode("utf-8"))))
+        with self._lock:
+            self._fns[key] = (fn, source)
+        return fn, source
+
+
+_step_fn_cache = None
+_step_fn_cache_lock = threading.Lock()
+
+def get_step_fn_cache() -> StepFnCache:
+    """Process-wide cache backed by the artifact store"""
+    global _step_fn_cache
+    with _step_fn_cache_lock:
+        if _step_fn_cache is None:
+            _step_fn_cache = StepFnCache()
+    return _step_fn_cache
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+from ai_maml_builder.maml import MAML
+
+
+# ##########################################
+# LEVEL 7 BATCH RUNNER
+# BioSTEAM keeps global state (main flowsheet, thermo, process settings), so level 7 simulations can't share a
+# process. Batches (many MAMLs, or many Monte Carlo samples of one) are farmed out to a pool of spawned worker
+# processes instead: each worker has its own flowsheet, imports BioSTEAM and sets up thermo once when it starts,
+# and runs simulations one at a time. Jobs are sent in chunks so thousands of samples aren't one round trip each, and
+# when every job is for the same MAML it's sent to each worker once (initializer) rather than with every job. Results
+# come back to the parent in job order, and a failed simulation is returned as an error rather than failing the batch.
+
+def level_7_worker_count(max_workers: int = None) -> int:
+    """max_workers, TEA_LEVEL_7_WORKERS, or every core"""
+    return max_workers or int(os.environ.get("TEA_LEVEL_7_WORKERS", 0)) or os.cpu_count() or 1
+
+_worker_maml = None # the batch's shared MAML, if every job uses the same one
+
+def _init_level_7_worker(shared_maml_json: dict = None):
+    global _worker_maml
+    from .tea_simulator_level_7 import setup_level_7_thermo # biosteam is only imported in workers
+    start_time = time.time()
+    setup_level_7_thermo()
+    _worker_maml = MAML(**shared_maml_json) if shared_maml_json != None else None
+    print(f"[tea_simulator_batch] worker {os.getpid()} ready in {time.time() - start_time:.1f} seconds")
+
+def _run_level_7_job(job: dict) -> dict:
+    from .tea_simulator_level_7 import tea_simulator_level_7
+    try:
+        maml = _worker_maml if job["maml"] == None else MAML(**job["maml"])
+        result = tea_simulator_level_7(maml, params=job["params"], output_dir_path=job["output_dir_path"])
+        return dict(result=result, error=None)
+    except Exception as err:
+        return dict(result=None, error=f"{type(err).__name__}: {err}")
+
+def _run_level_7_chunk(jobs: List[dict]) -> List[dict]:
+    return [_run_level_7_job(job) for job in jobs]
+
+def maml_output_dir_path(output_dir_path: Optional[str], maml: MAML) -> Optional[str]:
+    # outputs (flowsheet diagrams, CSVs) are written per MAML, so parallel runs don't overwrite each other's files
+    if output_dir_path == None:
+        return None
+    path = os.path.join(output_dir_path, re.sub(r"[^\w.\-]", "_", maml.id or "maml"))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def run_level_7_batch(jobs: List[Tuple[MAML, dict]], output_dir_path: str = None, max_workers: int = None,
+                      on_result: Callable[[int, dict], None] = None, chunksize: int = None) -> List[dict]:
+    """Run (maml, params) level 7 simulations across a process pool. Returns dict(result, error) per job, in order.
+        Jobs go to workers `chunksize` at a time (default: ~4 chunks per worker). If every job shares one MAML object
+        (ex: Monte Carlo samples) it's sent once per worker. `on_result(job index, dict(result, error))` is called as
+        each chunk finishes
+    """
+    if len(jobs) == 0:
+        return []
+    max_workers = min(level_7_worker_count(max_workers), len(jobs))
+    chunksize = chunksize or max(1, len(jobs) // (max_workers * 4))
+    shared_maml = jobs[0][0] if all(maml is jobs[0][0] for maml, _ in jobs) else None
+    start_time = time.time()
+    print(f"[run_level_7_batch] {len(jobs)} simulations across {max_workers} workers (chunks of {chunksize}, shared MAML: {shared_maml != None})")
+    job_dicts = [dict(maml=maml.json() if shared_maml == None else None, params=params, output_dir_path=maml_output_dir_path(output_dir_path, maml)) for maml, params in jobs]
+    results = [None] * len(jobs)
+    # spawned (not forked), since callers may be threaded and BioSTEAM state shouldn't be inherited from the parent
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_level_7_worker,
+                             initargs=(shared_maml.json() if shared_maml != None else None,)) as executor:
+        futures = { executor.submit(_run_level_7_chunk, job_dicts[start:start + chunksize]): start for start in range(0, len(jobs), chunksize) }
+        for future in as_completed(futures):
+            start = futures[future]
+            try:
+                chunk_results = future.result()
+            except Exception as err: # worker died (ex: out of memory), the pool is broken for the remaining jobs too
+                chunk_results = [dict(result=None, error=f"{type(err).__name__}: {err}")] * len(job_dicts[start:start + chunksize])
+            for i, result in enumerate(chunk_results, start=start):
+                results[i] = result
+                if results[i]["error"] != None:
+                    print(f"[run_level_7_batch] failed: {jobs[i][0].id}, {results[i]['error']}")
+                if on_result != None:
+                    on_result(i, results[i])
+    num_failed = sum(r["error"] != None for r in results)
+    print(f"[run_level_7_batch] {len(jobs)} simulations ({num_failed} failed) in {time.time() - start_time:.1f} seconds")
+    return results
@@ -1,8 +1,13 @@
 import inspect
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+import numpy as np
 import numpy_financial as npf
 from pydash import omit, snake_case
 from ai_maml_builder.maml import MAML
 from .clients import get_llm_client, get_llm_model
+from ai_knowledge_manager.llm_trace import traced_prompt
+from .step_fn_cache import get_step_fn_cache
 
 
 # ##########################################
@@ -113,6 +118,10 @@ def ethanol_purification(input_product_amount: float, distillation_extraction_ra
 ```
 """
 
+# bump when fn_process_prompt_v1 or the request below changes, so cached step functions are regenerated
+FN_PROCESS_PROMPT_VERSION = "fn_process_prompt_v1.1"
+
+@traced_prompt
 def generate_python_fn_process_flow_step(fn_name: str, process_flow_step: dict):
     print(f"[generate_python_fn_process_flow_step] creating: {fn_name}")
     client = get_llm_client()
@@ -153,6 +162,19 @@ def generate_python_fn_process_flow_step(fn_name: str, process_flow_step: dict):
 
 # ##########################################
 # MAML -> SPREADSHEET PROCESS FLOW SIMULATION TEA
+def get_process_flow_step_fns(maml: MAML) -> List[Tuple[str, Callable, str]]:
+    """(fn name, function, source) per process flow step, reused from the step function cache when this step/parameter list was generated before"""
+    step_fns = []
+    for step in maml.process_flow:
+        # ... write a function that takes the parameters and does a simple calculation to yield so output parameter/amount
+        fn_name = "process_function_output_num_" + snake_case(step.output.get("name"))  # snake_case(step.type) + "_to_num_" + snake_case(step.output.get("name"))
+        fn, fn_str = get_step_fn_cache().get_or_create(
+            fn_name=fn_name, step_type=step.type, parameters=step.parameters, prompt_version=FN_PROCESS_PROMPT_VERSION,
+            generate_fn=lambda step=step, fn_name=fn_name: generate_python_fn_process_flow_step(fn_name=fn_name, process_flow_step=step))
+        step_fns.append((fn_name, fn, fn_str))
+    print(f"[tea_simulator_level_1] step functions: {get_step_fn_cache().stats}")
+    return step_fns
+
 def tea_simulator_level_1(maml: MAML, params: dict):
     print("[tea_simulator_level_1] maml: ", maml)
 
@@ -160,13 +182,7 @@ def tea_simulator_level_1(maml: MAML, params: dict):
     process_flow_outputs = []
     process_flow_cost = params.get("cap_ex", 0) + (params.get("input_product_amount", 0) * params.get("input_product_price", 0))
     # for each process flow step
-    for step_idx, step in enumerate(maml.process_flow):
-        # ... write a function that takes the parameters and does a simple calculation to yield so output parameter/amount
-        fn_name = "process_function_output_num_" + snake_case(step.output.get("name"))  # snake_case(step.type) + "_to_num_" + snake_case(step.output.get("name"))
-        process_flow_step_fn_str = generate_python_fn_process_flow_step(fn_name=fn_name, process_flow_step=step)
-        # ... then eval
-        exec(process_flow_step_fn_str)
-        process_flow_step_fn = eval(fn_name)
+    for step_idx, (fn_name, process_flow_step_fn, process_flow_step_fn_str) in enumerate(get_process_flow_step_fns(maml)):
         sig = inspect.signature(process_flow_step_fn)
         params_for_fn = {k: v for k, v in params.items() if k in sig.parameters}
         fn_args = omit(params_for_fn, ["prices", "input_product_amount"])
@@ -205,3 +221,81 @@ def tea_simulator_level_1(maml: MAML, params: dict):
         npv=npv,
     )
     return result, process_flow_outputs
+
+
+# ##########################################
+# PARAMETER SWEEPS
+# Price sensitivity/design space exploration: every point of a parameter grid goes through the step functions as
+# NumPy arrays in one pass, and the analysis above is computed elementwise. Generated functions aren't always
+# array-safe (ex: `if x > 0:`, math.* calls), so a step that raises or disagrees with its scalar result on a
+# spot-checked point is evaluated row by row instead.
+
+def sweep_grid(sweep: Dict[str, Sequence[float]], grid: bool = True) -> Dict[str, np.ndarray]:
+    """Flat arrays, one per swept param: the cartesian product of the values (grid), or the values zipped together"""
+    names = list(sweep.keys())
+    values = [np.asarray(sweep[name], dtype=float) for name in names]
+    if grid:
+        values = [axis.ravel() for axis in np.meshgrid(*values, indexing="ij")]
+    elif len(set(len(v) for v in values)) > 1:
+        raise ValueError("Swept params must have the same length when grid=False")
+    return dict(zip(names, values))
+
+def _eval_step_fn_vectorized(fn: Callable, fn_args: dict, num_points: int) -> Tuple[np.ndarray, bool]:
+    """(outputs, vectorized?) of a step function over arrays of args, falling back to a per-row loop"""
+    def row_args(i: int) -> dict:
+        return { k: (v[i] if isinstance(v, np.ndarray) else v) for k, v in fn_args.items() }
+    try:
+        outputs = np.broadcast_to(np.asarray(fn(**fn_args), dtype=float), (num_points,))
+        # the result can be silently wrong (ex: python builtins over arrays), so check it against scalar calls
+        if all(np.isclose(outputs[i], float(fn(**row_args(i))), equal_nan=True) for i in {0, num_points - 1}):
+            return outputs, True
+    except Exception:
+        pass
+    return np.fromiter((fn(**row_args(i)) for i in range(num_points)), dtype=float, count=num_points), False
+
+def tea_simulator_level_1_sweep(maml: MAML, params: dict, sweep: Dict[str, Sequence[float]], grid: bool = True) -> Dict[str, np.ndarray]:
+    """Level 1 TEA over ranges of params (any key of params, ex: target_product_price, input_product_price, a step's kwarg).
+        Returns flat arrays for the swept params and each result metric (production_costs, minimal_selling_price, irr, npv, ...)
+        Ex) tea_simulator_level_1_sweep(maml, params, { "target_product_price": np.linspace(1, 5, 100), "input_product_price": np.linspace(20, 120, 100) })
+    """
+    start_time = time.time()
+    swept = sweep_grid(sweep, grid=grid)
+    num_points = len(next(iter(swept.values())))
+    values = { **params, **swept } # scalars for fixed params, arrays for swept ones
+    step_fns = get_process_flow_step_fns(maml)
+
+    # FUNCTIONS
+    output = values.get("input_product_amount")
+    scalar_steps = []
+    for fn_name, fn, _ in step_fns:
+        sig = inspect.signature(fn)
+        fn_args = omit({k: v for k, v in values.items() if k in sig.parameters}, ["prices", "input_product_amount"])
+        output, vectorized = _eval_step_fn_vectorized(fn, { "input_product_amount": output, **fn_args }, num_points)
+        if not vectorized:
+            scalar_steps.append(fn_name)
+
+    # ANALYSIS (same as tea_simulator_level_1, elementwise)
+    def value(key: str, default: float = 0) -> np.ndarray:
+        return np.broadcast_to(np.asarray(values.get(key, default), dtype=float), (num_points,))
+    target_product_price = value("target_product_price")
+    revenue = output * target_product_price
+    production_costs = value("cap_ex") + value("input_product_amount") * value("input_product_price")
+    # --- irr of [-target_product_price, revenue] (one period, so it has a closed form; nan w/o a sign change like npf.irr)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        irr = np.where((target_product_price > 0) & (revenue > 0) | (target_product_price < 0) & (revenue < 0), revenue / target_product_price - 1, np.nan)
+        minimal_selling_price = (production_costs - value("cap_ex")) * (1 + value("profit_margin", 0.1))
+        npv = -production_costs + revenue / (1 + value("discount_rate", 0.05))
+        minimal_selling_price_per_unit = minimal_selling_price / output
+
+    print(f"[tea_simulator_level_1_sweep] {num_points} points in {time.time() - start_time:.3f} seconds (row-by-row steps: {scalar_steps})")
+    return dict(
+        **swept,
+        output=output,
+        revenue=revenue,
+        production_costs=production_costs,
+        minimal_selling_price=minimal_selling_price,
+        minimal_selling_price_per_unit=minimal_selling_price_per_unit,
+        target_selling_price_per_unit=target_product_price,
+        irr=irr,
+        npv=npv,
+    )
@@ -1,11 +1,13 @@
 import os
 from ai_maml_builder.maml import MAML
 from .clients import get_llm_client, get_llm_model
+from ai_knowledge_manager.llm_trace import traced_prompt
 
 DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ##########################################
 # PROMPTS
+@traced_prompt
 def prompt_maml_to_csv_worksheet(maml: MAML) -> str:
     """Turn a MAML process flow and convert it to a CSV worksheet that includes formulas feeding into each step for a simple technoeconomic analysis"""
     print(f"[prompt_maml_to_csv_worksheet] start")
@@ -5,7 +5,7 @@ from biorefineries.tea import create_cellulosic_ethanol_tea
 import os
 import numpy as np
 from ai_maml_builder.maml import MAML
-from .polyfills.create_cellulosic_ethanol_chemicals import create_cellulosic_ethanol_chemicals
+from .thermo_registry import get_level_7_thermo
 
 
 # ##########################################
@@ -15,6 +15,14 @@ from .polyfills.create_cellulosic_ethanol_chemicals import create_cellulosic_eth
 # ##########################################
 # MAML -> BIOSTEAM SIMULATION TEA
 
+def setup_level_7_thermo():
+    """Process settings + the cellulosic chemical set (w/ the extra chemicals we need), set as BioSTEAM's thermo.
+        The thermo is compiled once per process (thermo_registry.py), so this is cheap after the first call"""
+    cellulosic.load_process_settings() # bootstrapping ethanol/cellulose related chemicals/streams to try and make this work simply
+    thermo = get_level_7_thermo()
+    bst.settings.set_thermo(thermo)
+    return thermo.chemicals
+
 def tea_simulator_level_7(maml: MAML, params: dict, output_dir_path: str = None):
     print("[tea_simulator_level_7] maml: ", maml.title, params)
 
@@ -22,20 +30,7 @@ def tea_simulator_level_7(maml: MAML, params: dict, output_dir_path: str = None)
     SM = bst.SystemMesh()
     bst.main_flowsheet.set_flowsheet('cellulosic')
     bst.main_flowsheet.clear()
-    cellulosic.load_process_settings() # bootstrapping ethanol/cellulose related chemicals/streams to try and make this work simply
-    # HACK: re-writing this function from biorefiners so we can pass in additional chemicals to compile
-    chems = create_cellulosic_ethanol_chemicals(HACK_chemicals_to_compile=(
-        # "Water", # provided by biosteam already? different than the stream below?
-        bst.Chemical('Hemicellulose', Cp=1.364, rho=1540, default=True, search_db=False, phase='s', formula="C5H8O5", Hf=-761906.4), # Xylose monomer minus water
-        bst.Chemical('Solids', Cp=1.100, rho=1540, default=True, search_db=False, phase='s', MW=1.),
-    ))
-    chems.define_group(
-        name='Fiber',
-        IDs=['Cellulose', 'Hemicellulose', 'Lignin'],
-        composition=[0.4704, 0.2775, 0.2520],
-        wt=True,
-    )
-    bst.settings.set_thermo(chems)
+    setup_level_7_thermo()
 
     # SYSTEM MESH COMPILATION (What are we aiming for? Ex: ethanol)
     # ... feedstock stream
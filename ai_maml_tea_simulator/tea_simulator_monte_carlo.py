@@ -0,0 +1,140 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from ai_maml_builder.maml import MAML
+from .tea_simulator_batch import run_level_7_batch
+from .tea_simulator_level_1 import tea_simulator_level_1_sweep
+
+
+# ##########################################
+# MONTE CARLO UNCERTAINTY
+# Params can carry distributions instead of point values (ex: dict(dist="triangular", low=1.8, mode=2.0, high=2.4),
+# see add_param_distributions). Samples are drawn in bulk, level 1 evaluates all of them in one vectorized sweep, and
+# level 7 (BioSTEAM, one simulation per sample) is spread across the level 7 process pool (tea_simulator_batch.py).
+# Results are summarized as percentile bands plus tornado-style sensitivities (how much each metric swings between a
+# param's low and high samples, and the rank correlation between them).
+
+MONTE_CARLO_METRICS = ["production_costs", "minimal_selling_price", "irr", "npv"]
+MONTE_CARLO_PERCENTILES = [5, 25, 50, 75, 95]
+
+
+# --- distributions
+
+def is_distribution(value) -> bool:
+    return isinstance(value, dict) and "dist" in value
+
+def point_value(spec: dict) -> float:
+    """Point estimate of a distribution (used for the non-sampled inputs and baseline runs)"""
+    if spec["dist"] == "triangular":
+        return spec["mode"]
+    if spec["dist"] in ("normal", "lognormal"):
+        return spec["mean"]
+    if spec["dist"] == "uniform":
+        return (spec["low"] + spec["high"]) / 2
+    if spec["dist"] == "choice":
+        return spec["values"][0]
+    raise ValueError(f"Distribution not handled: {spec['dist']}")
+
+def split_params(params: dict) -> Tuple[dict, Dict[str, dict]]:
+    """(params w/ point values, distributions by param name). Raises if no param carries a distribution"""
+    distributions = { key: value for key, value in params.items() if is_distribution(value) }
+    if len(distributions) == 0:
+        raise ValueError("No params carry a distribution (see add_param_distributions)")
+    return { key: point_value(value) if key in distributions else value for key, value in params.items() }, distributions
+
+def sample_params(distributions: Dict[str, dict], num_samples: int, seed: int = None) -> Dict[str, np.ndarray]:
+    """num_samples draws per param (independent), as arrays"""
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for key, spec in distributions.items():
+        if spec["dist"] == "triangular":
+            values = rng.triangular(spec["low"], spec["mode"], spec["high"], num_samples) if spec["low"] < spec["high"] else np.full(num_samples, float(spec["mode"]))
+        elif spec["dist"] == "normal":
+            values = rng.normal(spec["mean"], spec["std"], num_samples)
+        elif spec["dist"] == "lognormal":
+            # mean/std of the value itself (not of its log)
+            sigma = np.sqrt(np.log(1 + (spec["std"] / spec["mean"]) ** 2))
+            values = rng.lognormal(np.log(spec["mean"]) - sigma ** 2 / 2, sigma, num_samples)
+        elif spec["dist"] == "uniform":
+            values = rng.uniform(spec["low"], spec["high"], num_samples)
+        elif spec["dist"] == "choice":
+            values = rng.choice(np.asarray(spec["values"], dtype=float), num_samples)
+        else:
+            raise ValueError(f"Distribution not handled: {spec['dist']}")
+        # optional bounds (ex: percentages), for unbounded distributions
+        samples[key] = np.clip(values, spec.get("min", -np.inf), spec.get("max", np.inf))
+    return samples
+
+def _params_at(params: dict, samples: Dict[str, np.ndarray], i: int, maml: MAML) -> dict:
+    """Scalar params for sample i, keeping the `prices` dict (used by level 7) in sync with the sampled prices"""
+    params_i = { **params, "prices": dict(params.get("prices") or {}) }
+    for key, values in samples.items():
+        params_i[key] = float(values[i])
+        if key == "input_product_price" and maml.process_feedstock in params_i["prices"]:
+            params_i["prices"][maml.process_feedstock] = params_i[key]
+        elif key.endswith("_price_usd"):
+            params_i["prices"][key.replace("_price_usd", "")] = params_i[key]
+    return params_i
+
+
+# --- summaries
+
+def _json_float(value) -> float:
+    value = float(value)
+    return None if not np.isfinite(value) else value
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values))
+    ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+    return ranks
+
+def summarize_monte_carlo(samples: Dict[str, np.ndarray], results: Dict[str, np.ndarray], metrics: List[str] = MONTE_CARLO_METRICS, tail: float = 0.1) -> dict:
+    """Percentile bands per metric, and per metric a tornado of params sorted by swing: the metric's median over the
+        param's lowest `tail` of samples vs. its highest, plus their Spearman rank correlation. JSON-able (nan -> None)"""
+    summary = dict(num_samples=len(next(iter(samples.values()))) if samples else 0, metrics={}, sensitivities={})
+    for metric in metrics:
+        values = np.asarray(results[metric], dtype=float)
+        ok = np.isfinite(values)
+        if not ok.any():
+            summary["metrics"][metric] = dict(num_valid=0)
+            continue
+        percentiles = np.percentile(values[ok], MONTE_CARLO_PERCENTILES)
+        summary["metrics"][metric] = dict(
+            num_valid=int(ok.sum()),
+            mean=_json_float(values[ok].mean()),
+            std=_json_float(values[ok].std()),
+            **{ f"p{p}": _json_float(v) for p, v in zip(MONTE_CARLO_PERCENTILES, percentiles) })
+        tornado = []
+        for key, param_values in samples.items():
+            param_values = param_values[ok]
+            if len(param_values) < 2 or np.ptp(param_values) == 0:
+                continue
+            low_cut, high_cut = np.quantile(param_values, [tail, 1 - tail])
+            low = np.median(values[ok][param_values <= low_cut])
+            high = np.median(values[ok][param_values >= high_cut])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rank_corr = np.corrcoef(_rank(param_values), _rank(values[ok]))[0, 1]
+            tornado.append(dict(param=key, low=_json_float(low), high=_json_float(high), swing=_json_float(high - low), rank_correlation=_json_float(rank_corr)))
+        summary["sensitivities"][metric] = sorted(tornado, key=lambda t: -abs(t["swing"] or 0))
+    return summary
+
+
+# --- level 1 (vectorized)
+
+def monte_carlo_level_1(maml: MAML, params: dict, num_samples: int = 10000, seed: int = None) -> dict:
+    """Level 1 TEA over num_samples draws of the params' distributions, summarized"""
+    point_params, distributions = split_params(params)
+    samples = sample_params(distributions, num_samples, seed=seed)
+    results = tea_simulator_level_1_sweep(maml, point_params, samples, grid=False)
+    return summarize_monte_carlo(samples, results)
+
+
+# --- level 7 (process pool, every sample is a full simulation)
+
+def monte_carlo_level_7(maml: MAML, params: dict, num_samples: int = 200, seed: int = None, max_workers: int = None) -> dict:
+    """Level 7 TEA over num_samples draws, one BioSTEAM simulation per sample across a process pool, summarized"""
+    point_params, distributions = split_params(params)
+    samples = sample_params(distributions, num_samples, seed=seed)
+    # every job shares this MAML object, so the batch sends it once per worker and only the sampled params per job
+    sample_results = run_level_7_batch([(maml, _params_at(point_params, samples, i, maml)) for i in range(num_samples)], max_workers=max_workers)
+    results = { metric: np.array([r["result"].get(metric) if r["result"] != None else np.nan for r in sample_results], dtype=float) for metric in MONTE_CARLO_METRICS }
+    return summarize_monte_carlo(samples, results)
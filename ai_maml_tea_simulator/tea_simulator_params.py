@@ -26,3 +26,18 @@ def get_params_auto(maml: MAML) -> dict:
     params = generate_simulator_parameters(maml=maml, params_template=params_template)
     print("[get_params_auto] params: ", params)
     return params
+
+def add_param_distributions(params: dict, spread: float = 0.2, overrides: dict = None) -> dict:
+    """Params w/ every numeric value replaced by a distribution for Monte Carlo runs (see tea_simulator_monte_carlo.py):
+        triangular +/- spread around the point estimate, unless a distribution is given in overrides
+        Ex) add_param_distributions(params, overrides={ "target_product_price": dict(dist="normal", mean=2.5, std=0.3) })
+    """
+    params_dist = dict(params)
+    for key, value in params.items():
+        if (overrides or {}).get(key) != None:
+            params_dist[key] = overrides[key]
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and value != 0:
+            # min/max so negative values (ex: credits) still get low <= high
+            bounds = (value * (1 - spread), value * (1 + spread))
+            params_dist[key] = dict(dist="triangular", low=min(bounds), mode=value, high=max(bounds))
+    return params_dist
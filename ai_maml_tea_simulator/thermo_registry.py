@@ -0,0 +1,109 @@
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+import biosteam as bst
+import thermosteam as tmo
+from .polyfills.create_cellulosic_ethanol_chemicals import create_cellulosic_ethanol_chemicals
+
+
+# ##########################################
+# THERMO REGISTRY
+# Compiling the cellulosic chemical set takes seconds, and the polyfill's @chemical_cache can't help since every call
+# passes freshly constructed extra bst.Chemical objects. Extra chemicals/groups are described as plain data instead,
+# and the compiled Thermo is kept per process keyed on a hash of that description (+ thermosteam/biosteam/biorefineries/
+# python versions and the polyfill's source, so editing or upgrading any of them recompiles).
+# It's also pickled to THERMO_CACHE_DIR so new processes (ex: level 7 batch workers) load it instead of compiling,
+# unless THERMO_PICKLE_ENABLED=false.
+
+# chemicals level 7 needs on top of biorefineries' cellulosic set (kwargs for bst.Chemical)
+LEVEL_7_EXTRA_CHEMICALS = (
+    # "Water", # provided by biosteam already? different than the stream below?
+    dict(ID='Hemicellulose', Cp=1.364, rho=1540, default=True, search_db=False, phase='s', formula="C5H8O5", Hf=-761906.4), # Xylose monomer minus water
+    dict(ID='Solids', Cp=1.100, rho=1540, default=True, search_db=False, phase='s', MW=1.),
+)
+LEVEL_7_CHEMICAL_GROUPS = (
+    dict(name='Fiber', IDs=['Cellulose', 'Hemicellulose', 'Lignin'], composition=[0.4704, 0.2775, 0.2520], wt=True),
+)
+
+POLYFILL_PATH = os.path.join(os.path.dirname(__file__), "polyfills", "create_cellulosic_ethanol_chemicals.py")
+
+_thermos = {} # key -> tmo.Thermo, compiled/loaded this process
+_thermos_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _environment_key() -> tuple:
+    """Versions + polyfill source hash, computed once per process (package metadata lookups scan sys.path)"""
+    try:
+        biorefineries_version = importlib.metadata.version("biorefineries")
+    except importlib.metadata.PackageNotFoundError:
+        biorefineries_version = None
+    # read by path, since @chemical_cache wraps the function
+    with open(POLYFILL_PATH, 'rb') as file:
+        polyfill_hash = hashlib.sha256(file.read()).hexdigest()
+    return (tmo.__version__, bst.__version__, biorefineries_version, polyfill_hash, sys.version_info[0:2])
+
+def thermo_key(extra_chemicals: tuple, groups: tuple) -> str:
+    thermosteam_version, biosteam_version, biorefineries_version, polyfill_hash, python_version = _environment_key()
+    description = dict(extra_chemicals=extra_chemicals, groups=groups, thermosteam=thermosteam_version, biosteam=biosteam_version,
+                       biorefineries=biorefineries_version, polyfill=polyfill_hash, python=python_version)
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode("utf-8")).hexdigest()[0:16]
+
+def _pickle_path(key: str) -> str:
+    return os.path.join(os.environ.get("THERMO_CACHE_DIR", "./data/caches/thermo"), f"cellulosic_thermo_{key}.pkl")
+
+def _pickle_enabled() -> bool:
+    return os.environ.get("THERMO_PICKLE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+def _compile_thermo(extra_chemicals: tuple, groups: tuple) -> tmo.Thermo:
+    # HACK: re-writing this function from biorefiners so we can pass in additional chemicals to compile
+    chems = create_cellulosic_ethanol_chemicals(HACK_chemicals_to_compile=tuple(
+        bst.Chemical(spec["ID"], **{ k: v for k, v in spec.items() if k != "ID" }) for spec in extra_chemicals))
+    for group in groups:
+        chems.define_group(**group)
+    return tmo.Thermo(chems)
+
+def _load_pickled_thermo(path: str):
+    if not _pickle_enabled() or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    except Exception as err:
+        print(f"[thermo_registry] could not load {path}, recompiling: {err}")
+        return None
+
+def _pickle_thermo(path: str, thermo: tmo.Thermo):
+    if not _pickle_enabled():
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp" # concurrent workers may be writing the same file
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(thermo, file)
+        os.replace(tmp_path, path)
+    except Exception as err:
+        print(f"[thermo_registry] could not pickle thermo: {err}")
+
+def get_level_7_thermo(extra_chemicals: tuple = LEVEL_7_EXTRA_CHEMICALS, groups: tuple = LEVEL_7_CHEMICAL_GROUPS) -> tmo.Thermo:
+    """Thermo for the cellulosic chemicals + extras, compiled once per process (or loaded from its pickle)"""
+    key = thermo_key(extra_chemicals, groups)
+    with _thermos_lock:
+        if key not in _thermos:
+            start_time = time.time()
+            path = _pickle_path(key)
+            thermo = _load_pickled_thermo(path)
+            if thermo != None:
+                print(f"[thermo_registry] loaded {key} in {time.time() - start_time:.2f} seconds")
+            else:
+                thermo = _compile_thermo(extra_chemicals, groups)
+                print(f"[thermo_registry] compiled {key} in {time.time() - start_time:.2f} seconds")
+                _pickle_thermo(path, thermo)
+            _thermos[key] = thermo
+        return _thermos[key]
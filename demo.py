@@ -1,61 +1,75 @@
 from typing import List
 import sys
 
-from ai_knowledge_manager.agent_paper import PaperAgent
+from ai_knowledge_manager.ingest import ingest_papers
+from ai_knowledge_manager.parallel import run_parallel
 from ai_knowledge_manager.persistence import JSONPersistence
+from ai_knowledge_manager.spans import span_tracer
 from ai_maml_builder.agent_maml import MAMLAgent
 from ai_maml_builder.maml import MAML
 from ai_maml_tea_simulator.agent_tea_simulator import TEASimulatorAgent
 from ai_maml_tea_simulator.tea_simulator_params import get_params_auto
 
 
-# ##########################################
-# SETUP
-# --- as we parse papers, concat mamls for simulation later
-mamls: List[MAML] = []
-
-
-# ##########################################
-# PARSING PAPERS/TEXT & GENERATING MANUFACTURING MARKUP LANGUAGE (MAMLS)
-
-# ... generating MaML from text prompt
-if len(sys.argv) > 1 and sys.argv[1] == "--query":
-    text = input("Enter summary of biomanfuacturing process, feedstocks, output targets: ")
-    text = text.strip() + ". " + input("Enter any additional notes about the novelty of your process: ")
-    maml = MAMLAgent().generate_maml(text=text)
-    mamls.append(maml)
-# ... generating MaML from paper (local for demo, but can do external fetching/scraping)
-else:
-    txt_file_paths = [
-        "./data/papers/ethanol_production_from_lignocellulosic_biomass_by_recombinant_escherichia_coli_strain_fbr5.txt",
-        "./data/papers/tea_biofuels_coproduction_sugarcane.txt",
-        "./data/papers/tea_ethanol_from_alternative_biomass.txt",
-        "./data/papers/tea_ethanol_switchgrass_2.txt",
-        "./data/papers/tea_ethanol_switchgrass.txt",
-    ]
-    # ... for demo, cycling through local txt files
-    for txt_file_path in txt_file_paths:
-        ap = PaperAgent(persistence=JSONPersistence(cache_path="./data/caches/papers.json"))
-        # 1. Download/parse paper
-        ap.load_paper(link=txt_file_path)
-        # 2. Generate metadata/content
-        ap.process_paper()
-        # 3. If not review paper, Generate MAML (aka Manufacturing Markup Language)
-        if ap.paper.describes_process == "single_process":
-            am = MAMLAgent(cache_path="./data/caches/mamls.json")
-            maml = am.generate_maml(paper=ap.paper)
-            mamls.append(maml)
-
-
-# ##########################################
-# TEA / SIMULATIONS
-
-print("---")
-print("Starting Simulators...")
-print("---")
-for maml in mamls:
-    print(f"Simulating {maml.title} ({maml.id})...")
-    params = get_params_auto(maml=maml) # for sake of having demo run fast, auto-generating params
+def main():
+    # ##########################################
+    # SETUP
+    # --- as we parse papers, concat mamls for simulation later
+    mamls: List[MAML] = []
+
+
+    # ##########################################
+    # PARSING PAPERS/TEXT & GENERATING MANUFACTURING MARKUP LANGUAGE (MAMLS)
+
+    # ... generating MaML from text prompt
+    if len(sys.argv) > 1 and sys.argv[1] == "--query":
+        text = input("Enter summary of biomanfuacturing process, feedstocks, output targets: ")
+        text = text.strip() + ". " + input("Enter any additional notes about the novelty of your process: ")
+        maml = MAMLAgent().generate_maml(text=text)
+        mamls.append(maml)
+    # ... generating MaML from paper (local for demo, but can do external fetching/scraping)
+    else:
+        txt_file_paths = [
+            "./data/papers/ethanol_production_from_lignocellulosic_biomass_by_recombinant_escherichia_coli_strain_fbr5.txt",
+            "./data/papers/tea_biofuels_coproduction_sugarcane.txt",
+            "./data/papers/tea_ethanol_from_alternative_biomass.txt",
+            "./data/papers/tea_ethanol_switchgrass_2.txt",
+            "./data/papers/tea_ethanol_switchgrass.txt",
+        ]
+        # ... for demo, cycling through local txt files
+        # 1. Download/parse papers & 2. Generate metadata/content (concurrently)
+        papers = ingest_papers(txt_file_paths, persistence=JSONPersistence(cache_path="./data/caches/papers.json"))
+        for paper in papers:
+            # 3. If not review paper, Generate MAML (aka Manufacturing Markup Language)
+            if paper != None and paper.describes_process == "single_process":
+                am = MAMLAgent(cache_path="./data/caches/mamls.json")
+                maml = am.generate_maml(paper=paper)
+                mamls.append(maml)
+
+
+    # ##########################################
+    # TEA / SIMULATIONS
+
+    print("---")
+    print("Starting Simulators...")
+    print("---")
+    # --- for sake of having demo run fast, auto-generating params (independent LLM calls, so in parallel)
+    params_list = run_parallel([lambda maml=maml: get_params_auto(maml=maml) for maml in mamls])
+    # --- level 1 per MAML on threads, level 7 (BioSTEAM) across a process pool, then each MAML's evals are saved
     atea = TEASimulatorAgent(cache_path="./data/caches/teas.json")
-    evals = atea.run(maml=maml, levels=[1,7], input_params=params, output_dir_path="./data")
+    evals_by_maml = atea.run_batch(mamls=mamls, input_params=params_list, levels=[1,7], output_dir_path="./data")
+    for maml in mamls:
+        print(f"Simulated {maml.title} ({maml.id}): {len(evals_by_maml[maml.id])} evals")
     print("---")
+
+
+    # ##########################################
+    # TIMINGS
+    # --- per-stage totals, plus a trace to open in ui.perfetto.dev / chrome://tracing for a per-paper breakdown
+    span_tracer.print_summary()
+    span_tracer.export_chrome_trace("./data/caches/pipeline_trace.json")
+
+
+# level 7 simulations run in spawned worker processes, which re-import this module, so the demo only runs as __main__
+if __name__ == "__main__":
+    main()